@@ -1,6 +1,5 @@
-import operator
 import json
-from typing import TypedDict, List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
@@ -9,58 +8,67 @@ from cell_planner import generate_cells_for_step
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from common import llm
+from plan_library import PlanLibrary
+from state import AgentState, CellRecord
+from notebook_writer import NotebookWriter
+from cell_validator import validate_cells, has_errors
 
+plan_library = PlanLibrary()
 
-class AgentState(TypedDict):
-    """State management for the notebook generation workflow."""
-    objective: Optional[str]  # The main objective to achieve
-    data_description: Optional[str]  # Description of input data
-    feedback: Optional[str]  # Feedback from previous steps
-    fatal_error: bool  # Indicates if a critical error occurred
-    review_status: Optional[str]  # Status from reviewer: 'continue', 'end', 'replan'
-    steps_taken: int  # Number of steps completed
-    current_step: Optional[Dict[str, Any]]  # Current step being processed
-    previous_steps: List[Dict[str, Any]]  # History of completed steps
-    current_cells: List[Dict[str, Any]]  # Cells for current step
-    implemented_cells: List[Dict[str, Any]]  # Successfully implemented cells
-    evaluation: Optional[str]  # Evaluation from reflection agent
-    current_cell_index: int  # Index of current cell being processed
-    current_cells_code: Optional[List[Dict[str, Any]]]  # Code for current cell
+MAX_VALIDATION_RETRIES = 2  # coder retries for cells that fail validation before the run is marked fatal
+
+# First cell of every written notebook, so load_dataset() also works in kernels
+# that were not started by the kernel servers
+LOAD_DATASET_SHIM = """try:
+    load_dataset
+except NameError:
+    import os
+    import pandas as pd
+
+    def load_dataset(path):
+        \"\"\"Plain pandas fallback for the kernel servers' cached loader.\"\"\"
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".tsv":
+            return pd.read_csv(path, sep="\\t")
+        if extension in (".jsonl", ".ndjson"):
+            return pd.read_json(path, lines=True)
+        readers = {".json": pd.read_json, ".parquet": pd.read_parquet, ".feather": pd.read_feather, ".arrow": pd.read_feather}
+        return readers.get(extension, pd.read_csv)(path)
+"""
 
 
 def orchestrator_agent(state: AgentState) -> dict:
     """Orchestrator agent that plans and manages project steps."""
     print("--- Orchestrator Node ---")
     
-    # Initialize state with default values if not present
-    if not isinstance(state, dict):
-        state = {}
-    if "steps_taken" not in state:
-        state["steps_taken"] = 0
-    if "previous_steps" not in state:
-        state["previous_steps"] = []
-    
     # Get current state values
     steps = state.get("steps_taken", 0)
     objective = state.get("objective", "")
     data_description = state.get("data_description", "")
     previous_steps = state.get("previous_steps", [])
-    print(f"previous_steps: {previous_steps}")
+    print(f"previous_steps: {len(previous_steps)}")
     
-    next_step = generate_step(
-        objective=objective,
-        data_description=data_description,
-    )
+    # Reuse a stored plan step directly when a near-identical run exists
+    plan_match = state.get("plan_match") or plan_library.lookup(objective, data_description)
+    step_index = len(previous_steps)
+    if plan_match and plan_match["reuse"] and step_index < len(plan_match["plan"]):
+        print(f"Reusing step {step_index + 1} from stored plan (similarity {plan_match['similarity']})")
+        next_step = plan_match["plan"][step_index]["step"]
+    else:
+        next_step = generate_step(
+            objective=objective,
+            data_description=data_description,
+            template=plan_match["plan"] if plan_match else None,
+        )
     
     print(f"Generated Step: {json.dumps(next_step, indent=2)}")
     
-    # Update state with new step information
+    # Return only the updated fields; the step is appended to history once it has cells
     return {
-        **state,
         "steps_taken": steps + 1,
         "current_step": next_step,
-        "previous_steps": previous_steps + [{"step": next_step}] if previous_steps else [{"step": next_step}],
-        "current_cell_index": 0  # Reset cell index for new step
+        "current_cell_index": 0,  # Reset cell index for new step
+        "plan_match": plan_match
     }
 
 
@@ -70,17 +78,25 @@ def break_down_step(state: AgentState) -> dict:
     steps = state.get("steps_taken", 0)
     current_step = state.get("current_step", {})
     previous_steps = state.get("previous_steps", [])
+    plan_match = state.get("plan_match")
+    step_index = len(previous_steps)
     
-    cells = generate_cells_for_step(
-        step=current_step.get("description", ""),
-        previous_steps_and_cells=previous_steps
-    )
+    reusable = plan_match and plan_match["reuse"] and step_index < len(plan_match["plan"])
+    if reusable and "cells" in plan_match["plan"][step_index]:
+        print(f"Reusing cells for step {step_index + 1} from stored plan")
+        cells = plan_match["plan"][step_index]["cells"]
+    else:
+        cells = generate_cells_for_step(
+            step=current_step.get("description", ""),
+            previous_steps_and_cells=previous_steps
+        )
     
     print(f"Generated Cells: {json.dumps(cells, indent=2)}")
     
-    return {**state,
+    return {
         "steps_taken": steps + 1,
         "current_cells": cells,
+        "previous_steps": [{"step": current_step, "cells": cells}],  # appended by the reducer
         "feedback": f"Generated {len(cells)} cells for step {current_step.get('step_number', 1)}"
     }
 
@@ -108,12 +124,36 @@ code_agent = create_react_agent(
 )
 
 
+def format_hot_cells(cell_profiles: Optional[Dict[str, Any]]) -> str:
+    """Prompt section asking the code agent to optimize the slowest profiled cells."""
+    if not cell_profiles or not cell_profiles.get("hottest_cells"):
+        return ""
+    lines = ["", "    Performance: these earlier cells were the slowest when executed. Prefer faster equivalents",
+             "    (vectorized pandas/numpy, fewer passes over the data) and do not repeat their hot spots:"]
+    for cell in cell_profiles["hottest_cells"]:
+        lines.append(f"    - {cell['wall_s']:.2f}s wall, {cell['cpu_s']:.2f}s CPU: {json.dumps(cell.get('code_preview', ''))}")
+    return "\n".join(lines) + "\n"
+
+
+def format_validation_issues(state: AgentState) -> str:
+    """Prompt section handing the previous attempt's validation errors back to the code agent."""
+    issues = [issue for issue in state.get("validation_issues") or [] if issue["severity"] == "error"]
+    if not issues or not state.get("validation_attempts"):
+        return ""
+    lines = ["", "    Your previous attempt for these cells was rejected. Fix these problems:"]
+    for issue in issues:
+        line = f", line {issue['line']}" if issue.get("line") else ""
+        lines.append(f"    - cell {issue['cell'] + 1}{line}: {issue['message']}")
+    lines.append("    Previous attempt:")
+    lines.append("    " + json.dumps([cell["content"] for cell in state.get("current_cells_code") or []]))
+    return "\n".join(lines) + "\n"
+
+
 def code_agent_executor(state: AgentState) -> dict:
     """Executes the code generation for all cells in the current step."""
     print("--- code agent executor Node ---")
 
     current_cells = state.get("current_cells", [])
-    implemented_cells = state.get("implemented_cells", [])
     
     # Create a prompt for all cells at once
     prompt = f"""Generate content for the following Jupyter notebook cells:
@@ -132,7 +172,8 @@ def code_agent_executor(state: AgentState) -> dict:
     - Each cell should have a unique purpose and not overlap with other cells
     - Maintain clear separation of concerns between cells
     - Avoid redundant imports or data loading across cells
-
+    - Load data files with `load_dataset(path)`, which returns a pandas DataFrame (from a shared cache on the kernel servers, plain pandas readers elsewhere); do not define it yourself
+{format_hot_cells(state.get("cell_profiles"))}{format_validation_issues(state)}
     Return a JSON object with numbered cells containing their type and content.
     Example response format:
     {{
@@ -155,7 +196,7 @@ def code_agent_executor(state: AgentState) -> dict:
         cells = response_data.get("cells", {})
         
         # Convert cells to list format for state
-        cell_list = []
+        cell_list: List[CellRecord] = []
         for cell_num, cell_data in cells.items():
             cell_list.append({
                 "content": cell_data["content"],
@@ -163,15 +204,56 @@ def code_agent_executor(state: AgentState) -> dict:
                 "description": current_cells[int(cell_num)-1].get("description", "") if int(cell_num)-1 < len(current_cells) else ""
             })
         
+        # Reject obviously broken cells statically before anything reaches a kernel
+        validation_issues = validate_cells(
+            cell_list,
+            planned_cells=current_cells,
+            previous_cells=state.get("implemented_cells", [])
+        )
+        for issue in validation_issues:
+            print(f"Validation {issue['severity']} in cell {issue['cell']}: {issue['message']}")
+        
+        # Broken cells go back to the coder instead of into the notebook and plan library
+        if has_errors(validation_issues):
+            attempts = state.get("validation_attempts", 0) + 1
+            return {
+                "current_cells_code": cell_list,
+                "validation_issues": validation_issues,
+                "validation_attempts": attempts,
+                "fatal_error": attempts > MAX_VALIDATION_RETRIES
+            }
+        
+        # Write the new cells to the notebook on disk as soon as they exist
+        if state.get("notebook_path"):
+            with NotebookWriter(state["notebook_path"]) as notebook:
+                if not len(notebook):
+                    notebook.append_cell("code", LOAD_DATASET_SHIM)
+                for cell in cell_list:
+                    notebook.append_cell(cell["cell_type"], cell["content"])
+        
+        # Store the completed plan so similar objectives can skip planning calls
+        plan_match = state.get("plan_match")
+        if plan_match and plan_match["reuse"]:
+            plan_library.record_hit(plan_match["id"])
+        else:
+            plan_library.add(state.get("objective", ""), state.get("data_description", ""), state.get("previous_steps", []))
+        
         return {
-            **state,
             "current_cells_code": cell_list,
-            "implemented_cells": implemented_cells + cell_list,
-            "code_agent_executor_output": agent_response
+            "implemented_cells": cell_list,  # appended by the reducer
+            "validation_issues": validation_issues,
+            "validation_attempts": 0
         }
     except json.JSONDecodeError:
         print("Error: Could not parse agent response as JSON")
-        return state
+        return {}
+
+
+def route_after_coder(state: AgentState) -> str:
+    """Retry the coder while its cells fail validation and retries remain."""
+    if has_errors(state.get("validation_issues") or []) and not state.get("fatal_error"):
+        return "coder"
+    return END
 
 
 # --- Build the Graph ---
@@ -190,7 +272,7 @@ workflow.set_entry_point("orchestrator")
 # Add edges
 workflow.add_edge("orchestrator", "break_down_step")
 workflow.add_edge("break_down_step", "coder")
-workflow.add_edge("coder", END)
+workflow.add_conditional_edges("coder", route_after_coder, {"coder": "coder", END: END})
 
 # Compile the graph
 app = workflow.compile()
\ No newline at end of file
@@ -1,10 +1,16 @@
+import os
+import uuid
+from typing import Any, Dict, Optional
 from agents import app as langgraph_app
+from state import result_view
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
 
+NOTEBOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "notebooks")
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,14 +23,27 @@ app.add_middleware(
 class NotebookRequest(BaseModel):
     objective: str
     data_description: str
+    notebook_name: Optional[str] = None  # bare .ipynb file name under NOTEBOOK_DIR; defaults to a new one
+    cell_profiles: Optional[Dict[str, Any]] = None  # kernel server /profile summary, to optimize hot cells
+
+def notebook_path(name: Optional[str]) -> str:
+    """Resolve a client-supplied notebook name to a path inside NOTEBOOK_DIR."""
+    if not name:
+        return os.path.join(NOTEBOOK_DIR, f"{uuid.uuid4()}.ipynb")
+    if os.path.basename(name) != name or name.startswith(".") or not name.endswith(".ipynb"):
+        raise HTTPException(status_code=400, detail="notebook_name must be a bare .ipynb file name")
+    return os.path.join(NOTEBOOK_DIR, name)
 
 @app.post("/generate_notebook")
 async def generate_notebook(request: NotebookRequest):
+    path = notebook_path(request.notebook_name)
     try:
         result = langgraph_app.invoke({
             "objective": request.objective,
-            "data_description": request.data_description
+            "data_description": request.data_description,
+            "notebook_path": path,
+            "cell_profiles": request.cell_profiles
         })
-        return result
+        return result_view(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,81 @@
+"""Benchmark per-step state overhead of the notebook workflow graph.
+
+Runs a stub graph (no LLM calls) for many steps, once with the reducer-based
+AgentState and once with the old full-copy pattern, and prints the average
+node-to-node time for the first and last steps of each run.
+
+Usage: python bench_state.py [num_steps]
+"""
+import sys
+import time
+from typing import Any, Dict, List, Optional, TypedDict
+
+from langgraph.graph import StateGraph, END
+from state import AgentState
+
+CELLS_PER_STEP = 4
+CELL_CHARS = 2000
+WINDOW = 10  # steps averaged at each end of the run
+
+
+class CopyingState(TypedDict):
+    """The pre-reducer state shape: plain lists replaced wholesale every step."""
+    steps_taken: int
+    current_step: Optional[Dict[str, Any]]
+    previous_steps: List[Dict[str, Any]]
+    implemented_cells: List[Dict[str, Any]]
+
+
+def make_cells(step: int) -> List[Dict[str, Any]]:
+    return [{"cell_type": "code", "content": "x" * CELL_CHARS, "description": f"step {step} cell {i}"}
+            for i in range(CELLS_PER_STEP)]
+
+
+def build_graph(state_type, num_steps: int, timings: List[float], copying: bool):
+    def step_node(state):
+        timings.append(time.perf_counter())
+        steps = state.get("steps_taken", 0)
+        step = {"step": {"step_number": steps + 1, "description": "stub step"}, "cells": make_cells(steps)}
+        cells = make_cells(steps)
+        if copying:
+            return {
+                **state,
+                "steps_taken": steps + 1,
+                "current_step": step["step"],
+                "previous_steps": state.get("previous_steps", []) + [step],
+                "implemented_cells": state.get("implemented_cells", []) + cells,
+            }
+        return {
+            "steps_taken": steps + 1,
+            "current_step": step["step"],
+            "previous_steps": [step],
+            "implemented_cells": cells,
+        }
+
+    workflow = StateGraph(state_type)
+    workflow.add_node("step", step_node)
+    workflow.set_entry_point("step")
+    workflow.add_conditional_edges("step", lambda state: END if state["steps_taken"] >= num_steps else "step")
+    return workflow.compile()
+
+
+def run(state_type, num_steps: int, copying: bool) -> Dict[str, float]:
+    timings = []
+    graph = build_graph(state_type, num_steps, timings, copying)
+    started = time.perf_counter()
+    result = graph.invoke({"steps_taken": 0}, {"recursion_limit": num_steps + 10})
+    total = time.perf_counter() - started
+    deltas = [b - a for a, b in zip(timings, timings[1:])]
+    assert len(result["implemented_cells"]) == num_steps * CELLS_PER_STEP
+    return {
+        "total_s": round(total, 4),
+        "first_steps_ms": round(sum(deltas[:WINDOW]) / WINDOW * 1000, 3),
+        "last_steps_ms": round(sum(deltas[-WINDOW:]) / WINDOW * 1000, 3),
+    }
+
+
+if __name__ == "__main__":
+    num_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{num_steps} steps, {CELLS_PER_STEP} cells of {CELL_CHARS} chars per step")
+    print(f"reducers:  {run(AgentState, num_steps, copying=False)}")
+    print(f"full copy: {run(CopyingState, num_steps, copying=True)}")
@@ -0,0 +1,341 @@
+import ast
+import builtins
+import importlib.util
+import os.path
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+# Names the IPython kernel provides without an import
+IPYTHON_NAMES = {"display", "get_ipython", "In", "Out", "_", "__", "___", "exit", "quit"}
+
+# Helpers injected into every kernel by backend/kernel_bootstrap.py
+KERNEL_HELPERS = {"load_dataset"}
+
+# Exceptions that, when caught, make the imports in a try body optional
+IMPORT_GUARDS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+
+# Calls whose first string argument names a file being loaded
+LOAD_FUNCTIONS = {
+    "read_csv", "read_json", "read_excel", "read_parquet", "read_table", "read_feather",
+    "read_pickle", "read_sql", "load", "loadtxt", "genfromtxt", "imread", "load_dataset",
+}
+
+
+@lru_cache(maxsize=None)
+def module_available(name: str) -> bool:
+    """Whether a top-level module can be imported in this (the agent's) environment.
+
+    The kernel may run in a different environment; callers that know the kernel's
+    modules should pass them to validate_cells as available_modules.
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _load_key(path: str) -> str:
+    """Normalized file path, so the same file is recognised whichever reader loads it."""
+    return os.path.normpath(path.strip())
+
+
+def strip_magics(code: str) -> str:
+    """Blank out IPython magics and shell escapes so the cell parses as Python."""
+    lines = []
+    for line in code.split("\n"):
+        stripped = line.lstrip()
+        lines.append("" if stripped.startswith(("%", "!")) else line)
+    return "\n".join(lines)
+
+
+def _issue(cell: int, severity: str, kind: str, message: str, line: Optional[int] = None) -> Dict:
+    return {"cell": cell, "severity": severity, "kind": kind, "message": message, "line": line}
+
+
+def _catches_import_error(handler: ast.ExceptHandler) -> bool:
+    if handler.type is None:
+        return True
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(isinstance(t, ast.Name) and t.id in IMPORT_GUARDS for t in types)
+
+
+def _local_names(node: ast.AST) -> Set[str]:
+    """Names bound anywhere inside a function body (approximate, includes nested scopes)."""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+            names.add(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and child is not node:
+            names.add(child.name)
+        elif isinstance(child, ast.arg):
+            names.add(child.arg)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            names.update(alias.asname or alias.name.split(".")[0] for alias in child.names)
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.add(child.name)
+    return names
+
+
+class _NameChecker(ast.NodeVisitor):
+    """Walks one cell in execution order, tracking bound names and reporting unbound loads.
+
+    Loads at module level are checked immediately; loads inside function bodies
+    are deferred to the end of the cell, since they resolve when called.
+    """
+
+    def __init__(self, defined: Set[str]):
+        self.defined = defined  # module-level names, shared across cells
+        self.scopes = []  # local scopes (sets) for functions, classes and comprehensions
+        self.undefined = []  # (name, line)
+        self.deferred = []  # (name, line) loads inside function bodies
+        self.imports = []  # (module, line, guarded by an except ImportError)
+        self.loads = []  # (function, path, line)
+        self.wildcard = False
+        self.function_depth = 0
+        self.guarded_depth = 0
+
+    def bind(self, name: str):
+        (self.scopes[-1] if self.scopes else self.defined).add(name)
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Store):
+            self.bind(node.id)
+        elif isinstance(node.ctx, ast.Load):
+            if any(node.id in scope for scope in self.scopes) or node.id in self.defined:
+                return
+            if self.function_depth:
+                self.deferred.append((node.id, node.lineno))
+            else:
+                self.undefined.append((node.id, node.lineno))
+
+    def visit_Assign(self, node: ast.Assign):
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            self.visit_Name(ast.Name(id=node.target.id, ctx=ast.Load(), lineno=node.lineno))
+        self.visit(node.target)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if node.value is not None:
+            self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr):
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_For(self, node: ast.For):
+        self.visit(node.iter)
+        self.visit(node.target)
+        for stmt in node.body + node.orelse:
+            self.visit(stmt)
+
+    visit_AsyncFor = visit_For
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.imports.append((alias.name, node.lineno, bool(self.guarded_depth)))
+            self.bind(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.level == 0 and node.module:
+            self.imports.append((node.module, node.lineno, bool(self.guarded_depth)))
+        for alias in node.names:
+            if alias.name == "*":
+                self.wildcard = True
+            else:
+                self.bind(alias.asname or alias.name)
+
+    def visit_Try(self, node: ast.Try):
+        # Imports in a try body with an ImportError handler are optional
+        guarded = any(_catches_import_error(handler) for handler in node.handlers)
+        self.guarded_depth += guarded
+        for stmt in node.body:
+            self.visit(stmt)
+        self.guarded_depth -= guarded
+        for child in node.handlers + node.orelse + node.finalbody:
+            self.visit(child)
+
+    visit_TryStar = visit_Try
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name:
+            self.bind(node.name)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def visit_MatchAs(self, node):
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name:
+            self.bind(node.name)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.bind(node.name)
+
+    def visit_MatchMapping(self, node):
+        self.generic_visit(node)
+        if node.rest:
+            self.bind(node.rest)
+
+    def visit_Global(self, node: ast.Global):
+        self.defined.update(node.names)
+
+    def _visit_function(self, node, body: List[ast.AST]):
+        for decorator in getattr(node, "decorator_list", []):
+            self.visit(decorator)
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(default)
+        if not isinstance(node, ast.Lambda):
+            self.bind(node.name)
+        self.scopes.append(_local_names(node))
+        self.function_depth += 1
+        for stmt in body:
+            self.visit(stmt)
+        self.function_depth -= 1
+        self.scopes.pop()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self._visit_function(node, node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda):
+        self._visit_function(node, [node.body])
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for expr in node.decorator_list + node.bases + [k.value for k in node.keywords]:
+            self.visit(expr)
+        self.scopes.append(set())
+        for stmt in node.body:
+            self.visit(stmt)
+        self.scopes.pop()
+        self.bind(node.name)
+
+    def _visit_comprehension(self, node, elements: List[ast.AST]):
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        self.scopes.append(set())
+        for i, generator in enumerate(node.generators):
+            if i:
+                self.visit(generator.iter)
+            self.visit(generator.target)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in elements:
+            self.visit(element)
+        self.scopes.pop()
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+        if name in LOAD_FUNCTIONS and node.args:
+            first = node.args[0]
+            if isinstance(first, ast.Constant) and isinstance(first.value, str):
+                self.loads.append((name, first.value, node.lineno))
+        self.generic_visit(node)
+
+
+def validate_cells(cells: List[Dict], planned_cells: Optional[List[Dict]] = None,
+                   previous_cells: Optional[List[Dict]] = None,
+                   available_modules: Iterable[str] = ()) -> List[Dict]:
+    """Statically check generated cells before they are sent to a kernel.
+
+    Checks syntax, names used before any earlier cell defines them, imports of
+    modules that are not installed, and data loads that repeat an earlier cell.
+    Modules are looked up in available_modules (the kernel's, when the caller
+    knows them) and then in this process's environment; imports guarded by an
+    ImportError handler only produce warnings.
+    planned_cells (CellStructure dicts, aligned with cells) are cross-checked
+    against the names each cell actually defines. previous_cells are already
+    implemented cells whose names and loads are taken as given.
+
+    Returns a list of issue dicts with cell index, severity ('error' or
+    'warning'), kind, message and line.
+    """
+    defined = set(dir(builtins)) | IPYTHON_NAMES | KERNEL_HELPERS
+    available = set(available_modules)
+    seen_loads = {}  # normalized path -> label of the cell that loaded it
+    issues = []
+    unparsed = False  # after a syntax error, names it would have defined are unknown
+    wildcard = False
+
+    def check(index: int, label: str, code: str, report: bool):
+        nonlocal unparsed, wildcard
+        try:
+            tree = ast.parse(strip_magics(code))
+        except SyntaxError as e:
+            if report:
+                issues.append(_issue(index, "error", "syntax", f"{e.msg}", e.lineno))
+            unparsed = True
+            return
+        checker = _NameChecker(defined)
+        checker.wildcard = wildcard
+        checker.visit(tree)
+        wildcard = checker.wildcard
+        if not report:
+            for _, path, _ in checker.loads:
+                seen_loads.setdefault(_load_key(path), label)
+            return
+
+        if not wildcard:
+            # Loads inside functions may still be defined by a later cell before the call
+            deferred = [(name, line) for name, line in checker.deferred if name not in defined]
+            reported = set()
+            for names, severity in ((checker.undefined, "warning" if unparsed else "error"), (deferred, "warning")):
+                for name, line in names:
+                    if name not in reported:
+                        reported.add(name)
+                        issues.append(_issue(index, severity, "undefined_name",
+                                             f"'{name}' is used before any cell defines it", line))
+        for module, line, guarded in checker.imports:
+            top = module.split(".")[0]
+            if top not in available and not module_available(top):
+                issues.append(_issue(index, "warning" if guarded else "error", "missing_module",
+                                     f"module '{top}' is not installed", line))
+        for _, path, line in checker.loads:
+            key = _load_key(path)
+            if key in seen_loads:
+                issues.append(_issue(index, "warning", "duplicate_load",
+                                     f"'{path}' is already loaded by {seen_loads[key]}", line))
+            else:
+                seen_loads[key] = f"cell {index}"
+
+    for index, cell in enumerate(previous_cells or []):
+        if cell.get("cell_type") == "code":
+            check(index, f"earlier cell {index}", cell.get("content", ""), report=False)
+
+    for index, cell in enumerate(cells):
+        planned = planned_cells[index] if planned_cells and index < len(planned_cells) else {}
+        if cell.get("cell_type") != "code":
+            continue
+        for name in planned.get("variables_used") or []:
+            if name not in defined and not unparsed and not wildcard:
+                issues.append(_issue(index, "warning", "plan_mismatch",
+                                     f"planned input '{name}' is not created by any earlier cell"))
+        check(index, f"cell {index}", cell.get("content", ""), report=True)
+        for name in planned.get("variables_created") or []:
+            if name not in defined and not unparsed:
+                issues.append(_issue(index, "warning", "plan_mismatch",
+                                     f"planned variable '{name}' is not created by this cell"))
+    return issues
+
+
+def has_errors(issues: List[Dict]) -> bool:
+    return any(issue["severity"] == "error" for issue in issues)
@@ -1,18 +1,10 @@
-from langchain_openai import ChatOpenAI
-import json
-from azure.core.credentials import AzureKeyCredential
+from llm_pool import build_pool, load_config
 
 # Load configuration
-with open('config.json', 'r') as f:
-    config = json.load(f)
+config = load_config()
 
-# Initialize LLM
-llm = ChatOpenAI(
-    api_key=config['apiKey'],
-    model=config['model'],
-    base_url=config['baseURL'],
-    temperature=0.1
-)
+# Initialize the shared LLM pool; every agent module imports this client
+llm = build_pool(config, temperature=0.1)
 
 
 
@@ -0,0 +1,251 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional
+
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from langchain_openai import ChatOpenAI
+from pydantic import ConfigDict, Field
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+# Errors worth retrying on another endpoint; anything else is raised immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-pool")
+
+
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    """Load the shared LLM configuration file."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_endpoints(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Normalize the config into a list of endpoint dicts.
+
+    Either an explicit "endpoints" list or the top-level apiKey/model/baseURL
+    keys; missing endpoint keys fall back to the top-level values.
+    """
+    defaults = {key: config[key] for key in ("apiKey", "model", "baseURL") if key in config}
+    endpoints = config.get("endpoints") or [defaults]
+    return [{**defaults, **endpoint} for endpoint in endpoints]
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available."""
+        with self.lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class Endpoint:
+    """One provider endpoint/key with its own rate limit and latency stats."""
+
+    def __init__(self, name: str, client: ChatOpenAI, requests_per_minute: float, window: int = 512):
+        self.name = name
+        self.client = client
+        self.bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1.0, requests_per_minute / 60.0 * 5))
+        self.latencies = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.hedges = 0
+        self.cooldown_until = 0.0
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self.lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def record(self, latency: Optional[float] = None, error: Optional[Exception] = None):
+        with self.lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            if error is not None:
+                self.errors += 1
+                if isinstance(error, openai.RateLimitError):
+                    self.throttled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "hedges": self.hedges,
+            "in_flight": self.in_flight,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class PooledChatModel(BaseChatModel):
+    """Chat model that spreads calls over several endpoints.
+
+    Each endpoint has a token-bucket limit; failed calls are retried on the
+    next best endpoint with jittered exponential backoff, and slow calls can
+    be hedged with a second request once they pass the endpoint's latency
+    percentile. Tool binding and structured output are delegated to the
+    first endpoint's ChatOpenAI client so prompts look the same everywhere.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    endpoints: List[Any] = Field(default_factory=list)
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 20.0
+    hedge_percentile: Optional[float] = 95.0
+    hedge_min_samples: int = 20
+    # 429s put an endpoint on cooldown for this long before it is picked again
+    throttle_cooldown: float = 5.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-chat-openai"
+
+    def bind_tools(self, tools, **kwargs):
+        formatted = self.endpoints[0].client.bind_tools(tools, **kwargs)
+        return self.bind(**formatted.kwargs)
+
+    def _pick_endpoint(self, exclude=()) -> Endpoint:
+        """Pick the least-loaded endpoint with a free token, waiting if all are limited."""
+        while True:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in exclude and e.cooldown_until <= now]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e not in exclude] or list(self.endpoints)
+            candidates.sort(key=lambda e: (e.in_flight, e.percentile(50) or 0.0))
+            for endpoint in candidates:
+                if endpoint.bucket.try_acquire():
+                    return endpoint
+            time.sleep(min(e.bucket.wait_time() for e in candidates) or 0.01)
+
+    def _call(self, endpoint: Endpoint, messages, stop, kwargs) -> ChatResult:
+        with endpoint.lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        started = time.monotonic()
+        try:
+            result = endpoint.client._generate(messages, stop=stop, **kwargs)
+        except Exception as e:
+            endpoint.record(error=e)
+            if isinstance(e, openai.RateLimitError):
+                endpoint.cooldown_until = time.monotonic() + self.throttle_cooldown
+            raise
+        finally:
+            with endpoint.lock:
+                endpoint.in_flight -= 1
+        endpoint.record(latency=time.monotonic() - started)
+        return result
+
+    def _hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.endpoints) < 2:
+            return None
+        if len(endpoint.latencies) < self.hedge_min_samples:
+            return None
+        return endpoint.percentile(self.hedge_percentile)
+
+    def _call_hedged(self, endpoint: Endpoint, messages, stop, kwargs) -> ChatResult:
+        delay = self._hedge_delay(endpoint)
+        if delay is None:
+            return self._call(endpoint, messages, stop, kwargs)
+
+        primary = _hedge_executor.submit(self._call, endpoint, messages, stop, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        backup_endpoint = self._pick_endpoint(exclude=(endpoint,))
+        with backup_endpoint.lock:
+            backup_endpoint.hedges += 1
+        backup = _hedge_executor.submit(self._call, backup_endpoint, messages, stop, kwargs)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        last_endpoint = None
+        for attempt in range(self.max_retries + 1):
+            endpoint = self._pick_endpoint(exclude=(last_endpoint,) if last_endpoint and len(self.endpoints) > 1 else ())
+            try:
+                return self._call_hedged(endpoint, messages, stop, kwargs)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                last_endpoint = endpoint
+                # Full jitter keeps retries from synchronizing across workers
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint request, error, throttle, hedge and latency stats."""
+        return {endpoint.name: endpoint.stats() for endpoint in self.endpoints}
+
+
+def build_pool(config: Optional[Dict[str, Any]] = None, temperature: float = 0.1) -> PooledChatModel:
+    """Build a PooledChatModel from the shared config."""
+    config = config if config is not None else load_config()
+    pool_config = config.get("pool", {})
+    endpoints = []
+    for i, endpoint in enumerate(load_endpoints(config)):
+        client = ChatOpenAI(
+            api_key=endpoint['apiKey'],
+            model=endpoint['model'],
+            base_url=endpoint['baseURL'],
+            temperature=temperature,
+            max_retries=0  # retries are handled by the pool
+        )
+        rpm = endpoint.get("requestsPerMinute", pool_config.get("requestsPerMinute", 60))
+        endpoints.append(Endpoint(endpoint.get("name", f"{i}:{endpoint['baseURL']}"), client, rpm))
+    return PooledChatModel(
+        endpoints=endpoints,
+        max_retries=pool_config.get("maxRetries", 4),
+        hedge_percentile=pool_config.get("hedgePercentile", 95.0),
+        hedge_min_samples=pool_config.get("hedgeMinSamples", 20),
+    )
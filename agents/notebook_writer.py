@@ -0,0 +1,188 @@
+import json
+import mmap
+import os
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+NBFORMAT = 4
+NBFORMAT_MINOR = 5
+
+DEFAULT_METADATA = {
+    "kernelspec": {"display_name": "Python 3", "language": "python", "name": "python3"},
+    "language_info": {"name": "python"},
+}
+
+_HEADER = b'{\n "cells": [\n'
+_INDEX_LINE = 34  # "<16-digit start> <16-digit end>\n"
+
+
+def index_path(path: str) -> str:
+    """Sidecar file holding the byte range of every cell in the notebook."""
+    return f"{path}.idx"
+
+
+def make_cell(cell_type: str, source: str, outputs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Build an nbformat 4.5 cell dict."""
+    cell = {"cell_type": cell_type, "id": uuid.uuid4().hex[:8], "metadata": {}, "source": source}
+    if cell_type == "code":
+        cell["execution_count"] = None
+        cell["outputs"] = outputs or []
+    return cell
+
+
+def stream_output(text: str, name: str = "stdout") -> Dict[str, Any]:
+    return {"output_type": "stream", "name": name, "text": text}
+
+
+class NotebookWriter:
+    """Appends cells to an .ipynb on disk without rewriting the cells already written.
+
+    The file is valid nbformat JSON after every call: each append overwrites only
+    the closing trailer, and the byte range of every cell goes to a sidecar index
+    so NotebookReader can load single cells. Opening a path that already has an
+    index resumes it; a path with no file starts a new notebook. Any other existing
+    file raises FileExistsError rather than being overwritten.
+    """
+
+    def __init__(self, path: str, metadata: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.metadata = metadata or DEFAULT_METADATA
+        self.offsets = []  # (start, end) byte range of each cell
+        if os.path.exists(path) and os.path.exists(index_path(path)):
+            self.f = open(path, 'r+b')
+            self.index = open(index_path(path), 'r+b')
+            self.offsets = _read_index(self.index)
+        elif os.path.exists(path):
+            raise FileExistsError(f"{path} exists but has no notebook index; refusing to overwrite it")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.f = open(path, 'x+b')
+            try:
+                self.index = open(index_path(path), 'x+b')
+            except OSError:
+                self.f.close()
+                os.remove(path)
+                raise
+            self.f.write(_HEADER)
+            self._write_trailer(len(_HEADER))
+
+    def _trailer(self) -> bytes:
+        tail = json.dumps({"metadata": self.metadata, "nbformat": NBFORMAT, "nbformat_minor": NBFORMAT_MINOR}, indent=1)
+        return b"\n ],\n" + tail[1:].encode()
+
+    def _write_trailer(self, position: int):
+        self.f.seek(position)
+        self.f.write(self._trailer())
+        self.f.truncate()
+        self.f.flush()
+
+    def _write_cells(self, cells: List[Dict[str, Any]]):
+        """Write cells after the last indexed cell, then close the document again."""
+        position = self.offsets[-1][1] if self.offsets else len(_HEADER)
+        self.f.seek(position)
+        self.index.seek(len(self.offsets) * _INDEX_LINE)
+        for cell in cells:
+            if self.offsets:
+                self.f.write(b",\n")
+                position += 2
+            data = json.dumps(cell, indent=1).encode()
+            self.f.write(data)
+            self.offsets.append((position, position + len(data)))
+            self.index.write(f"{position:016d} {position + len(data):016d}\n".encode())
+            position += len(data)
+        self.index.truncate()
+        self.index.flush()
+        self._write_trailer(position)
+
+    def append_cell(self, cell_type: str, source: str, outputs: Optional[List[Dict[str, Any]]] = None) -> int:
+        """Append a cell and return its index."""
+        self._write_cells([make_cell(cell_type, source, outputs)])
+        return len(self.offsets) - 1
+
+    def set_outputs(self, index: int, outputs: List[Dict[str, Any]], execution_count: Optional[int] = None):
+        """Replace a code cell's outputs.
+
+        Only the cells from `index` onward are rewritten, so updating the cell
+        that was just appended stays cheap.
+        """
+        tail = [self._read_cell(i) for i in range(index, len(self.offsets))]
+        tail[0]["outputs"] = outputs
+        tail[0]["execution_count"] = execution_count
+        # Drop the separator before the rewritten cell; _write_cells adds it back
+        self.offsets = self.offsets[:index]
+        self._write_cells(tail)
+
+    def _read_cell(self, index: int) -> Dict[str, Any]:
+        start, end = self.offsets[index]
+        self.f.seek(start)
+        return json.loads(self.f.read(end - start))
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def close(self):
+        self.f.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_index(index_file) -> List[tuple]:
+    index_file.seek(0)
+    offsets = []
+    for line in index_file.read().splitlines():
+        start, end = line.split()
+        offsets.append((int(start), int(end)))
+    return offsets
+
+
+class NotebookReader:
+    """Memory-mapped reader that parses cells one at a time.
+
+    With a sidecar index, cells are sliced straight out of the mapped file, so
+    only the cells touched are ever decoded. Without one it falls back to
+    parsing the whole notebook.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.f = open(path, 'rb')
+        size = os.fstat(self.f.fileno()).st_size
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.offsets = None
+        self.cells = None
+        if os.path.exists(index_path(path)):
+            with open(index_path(path), 'rb') as index_file:
+                offsets = _read_index(index_file)
+            # A writer may have appended since the index was read; ignore ranges past the mapped size
+            self.offsets = [(start, end) for start, end in offsets if end <= size]
+        if self.offsets is None:
+            self.cells = json.loads(self.mm[:] if self.mm else b"{}").get("cells", [])
+
+    def __len__(self) -> int:
+        return len(self.offsets) if self.offsets is not None else len(self.cells)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if self.cells is not None:
+            return self.cells[index]
+        start, end = self.offsets[index]
+        return json.loads(self.mm[start:end])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
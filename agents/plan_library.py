@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_library.json")
+
+NUM_PERM = 64  # MinHash signature length
+BANDS = 16  # LSH bands; NUM_PERM / BANDS rows per band
+OBJECTIVE_WEIGHT = 0.6  # the rest of the score comes from the data schema
+REUSE_THRESHOLD = 0.85  # at or above this a stored plan is replayed as-is
+TEMPLATE_THRESHOLD = 0.5  # at or above this a stored plan is offered as a template
+MIN_DATA_SIMILARITY = 0.3  # below this a plan for different data is never matched, however close the objective
+
+_MERSENNE = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE)
+    for i in range(NUM_PERM)
+]
+_STOPWORDS = {"a", "an", "and", "the", "of", "to", "in", "for", "on", "with", "by", "is", "are", "contains"}
+
+
+def shingles(text: str) -> set:
+    """Lowercased identifier-like tokens (file names kept whole), with a crude plural strip."""
+    words = (w.strip(".") for w in re.findall(r"[a-z0-9_.]+", text.lower()))
+    return {w[:-1] if w.endswith("s") and len(w) > 3 else w for w in words if w and w not in _STOPWORDS}
+
+
+def minhash(tokens: set) -> Optional[List[int]]:
+    """MinHash signature of a token set, or None for an empty set (which matches nothing)."""
+    if not tokens:
+        return None
+    hashed = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "big") for t in tokens]
+    return [min((a * h + b) % _MERSENNE for h in hashed) for a, b in _PERMUTATIONS]
+
+
+def estimate_jaccard(sig_a: Optional[List[int]], sig_b: Optional[List[int]]) -> float:
+    if sig_a is None or sig_b is None:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _band_keys(signature: Optional[List[int]], prefix: str) -> List[str]:
+    """LSH bucket keys; prefix keeps objective and data bands in separate buckets."""
+    if signature is None:
+        return []
+    rows = NUM_PERM // BANDS
+    return [f"{prefix}{i}:{hash(tuple(signature[i * rows:(i + 1) * rows]))}" for i in range(BANDS)]
+
+
+def _signatures(objective: str, data_description: str):
+    return minhash(shingles(objective)), minhash(shingles(data_description))
+
+
+class PlanLibrary:
+    """Local store of completed step/cell plans, indexed by objective and data similarity.
+
+    Plans are kept in a JSON file next to this module. Candidate plans are found
+    through MinHash LSH buckets over objective and data, then scored with a weighted
+    Jaccard estimate over objective and data description. A plan close enough to
+    be reused replaces the stored entry it matches instead of adding a new one.
+    """
+
+    def __init__(self, path: str = LIBRARY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.buckets = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for entry in json.load(f):
+                    self._index(entry)
+
+    def _index(self, entry: Dict):
+        self.entries[entry["id"]] = entry
+        for key in _band_keys(entry["objective_sig"], "o") + _band_keys(entry["data_sig"], "d"):
+            self.buckets.setdefault(key, set()).add(entry["id"])
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(list(self.entries.values()), f)
+        os.replace(tmp_path, self.path)
+
+    def _best_match(self, objective_sig, data_sig):
+        """Highest-scoring candidate from the LSH buckets whose data is similar enough; call with the lock held."""
+        candidates = set()
+        for key in _band_keys(objective_sig, "o") + _band_keys(data_sig, "d"):
+            candidates |= self.buckets.get(key, set())
+        best, best_score = None, 0.0
+        for entry_id in candidates:
+            entry = self.entries[entry_id]
+            data_score = estimate_jaccard(data_sig, entry["data_sig"])
+            if data_score < MIN_DATA_SIMILARITY:
+                continue
+            score = (OBJECTIVE_WEIGHT * estimate_jaccard(objective_sig, entry["objective_sig"])
+                     + (1 - OBJECTIVE_WEIGHT) * data_score)
+            if score > best_score:
+                best, best_score = entry, score
+        return best, best_score
+
+    def add(self, objective: str, data_description: str, plan: List[Dict]) -> Optional[str]:
+        """Store a completed plan (a list of {"step", "cells"} dicts) and return its id.
+
+        A near-duplicate of a stored plan (at or above REUSE_THRESHOLD) updates that
+        entry in place. Runs with no objective or data tokens are not stored.
+        """
+        objective_sig, data_sig = _signatures(objective, data_description)
+        if objective_sig is None and data_sig is None:
+            return None
+        with self.lock:
+            existing, score = self._best_match(objective_sig, data_sig)
+            if existing is not None and score >= REUSE_THRESHOLD:
+                existing["plan"] = plan
+                existing["updated_at"] = time.time()
+                self._save()
+                return existing["id"]
+            entry = {
+                "id": str(uuid.uuid4()),
+                "objective": objective,
+                "data_description": data_description,
+                "plan": plan,
+                "objective_sig": objective_sig,
+                "data_sig": data_sig,
+                "created_at": time.time(),
+                "hits": 0,
+            }
+            self._index(entry)
+            self._save()
+        return entry["id"]
+
+    def lookup(self, objective: str, data_description: str,
+               min_similarity: float = TEMPLATE_THRESHOLD) -> Optional[Dict]:
+        """Return the most similar stored plan, or None if nothing clears min_similarity.
+
+        The result carries the plan, its similarity score and a "reuse" flag that
+        is set when the match is close enough to replay without planning calls.
+        """
+        objective_sig, data_sig = _signatures(objective, data_description)
+        if objective_sig is None and data_sig is None:
+            return None
+        with self.lock:
+            best, best_score = self._best_match(objective_sig, data_sig)
+        if best is None or best_score < min_similarity:
+            return None
+        return {
+            "id": best["id"],
+            "objective": best["objective"],
+            "plan": best["plan"],
+            "similarity": round(best_score, 3),
+            "reuse": best_score >= REUSE_THRESHOLD,
+        }
+
+    def record_hit(self, entry_id: str):
+        with self.lock:
+            if entry_id in self.entries:
+                self.entries[entry_id]["hits"] += 1
+                self._save()
@@ -27,6 +27,8 @@ PLANNING_PROMPT = """
 
         {previous_steps_context}
 
+        {template_context}
+
         **Instructions:**
         1. Understand the objective and the data.
         2. {step_instruction}
@@ -54,13 +56,15 @@ def create_planning_workflow():
     workflow.add_edge("call_llm", END)
     return workflow.compile()
 
-def generate_step(objective: str, data_description: str, previous_steps_and_cells: Optional[List[Dict]] = None) -> Dict:
+def generate_step(objective: str, data_description: str, previous_steps_and_cells: Optional[List[Dict]] = None,
+                  template: Optional[List[Dict]] = None) -> Dict:
     """Generate a step in the data science project plan.
     
     Args:
         objective: The project objective
         data_description: Description of available data
         previous_steps_and_cells: List of previous steps and their cells. If None, this will be the first step.
+        template: Steps and cells of a similar completed plan to adapt, if one was found.
     """
     app = create_planning_workflow()
     
@@ -86,10 +90,18 @@ def generate_step(objective: str, data_description: str, previous_steps_and_cell
             step_instruction = "Create the next investigation step to analyze new aspects or verify previous solutions."
             additional_instruction = "Focus on analyzing data or checking assumptions based on previous steps."
     
+    template_context = ""
+    if template:
+        template_context = (
+            "**Similar Completed Plan (adapt it where it fits this objective and data):**\n"
+            f"{json.dumps([entry['step'] for entry in template], indent=2)}"
+        )
+    
     response = app.invoke(PLANNING_PROMPT.format(
         objective=objective,
         data_description=data_description,
         previous_steps_context=previous_steps_context,
+        template_context=template_context,
         step_instruction=step_instruction,
         additional_instruction=additional_instruction
     ))
@@ -0,0 +1,52 @@
+import operator
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
+
+
+class CellRecord(TypedDict):
+    """Compact record of a generated notebook cell."""
+    cell_type: str  # 'code' or 'markdown'
+    content: str  # Cell source
+    description: str  # What the cell does, from the cell plan
+
+
+class AgentState(TypedDict):
+    """State management for the notebook generation workflow.
+
+    History fields use append reducers, so nodes return only their new entries.
+    operator.add still builds a new list on each update, so LangGraph copies the
+    history per step much as before; bench_state.py measures no speedup.
+    """
+    objective: Optional[str]  # The main objective to achieve
+    data_description: Optional[str]  # Description of input data
+    feedback: Optional[str]  # Feedback from previous steps
+    fatal_error: bool  # Indicates if a critical error occurred
+    review_status: Optional[str]  # Status from reviewer: 'continue', 'end', 'replan'
+    steps_taken: int  # Number of steps completed
+    current_step: Optional[Dict[str, Any]]  # Current step being processed
+    previous_steps: Annotated[List[Dict[str, Any]], operator.add]  # Completed steps with their planned cells
+    current_cells: List[Dict[str, Any]]  # Cells for current step
+    implemented_cells: Annotated[List[CellRecord], operator.add]  # Successfully implemented cells
+    evaluation: Optional[str]  # Evaluation from reflection agent
+    current_cell_index: int  # Index of current cell being processed
+    current_cells_code: Optional[List[CellRecord]]  # Code for current cell
+    plan_match: Optional[Dict[str, Any]]  # Similar stored plan from the plan library, if any
+    notebook_path: Optional[str]  # .ipynb that generated cells are appended to as they arrive
+    validation_issues: List[Dict[str, Any]]  # Static pre-flight issues for current_cells_code
+    validation_attempts: int  # Consecutive coder attempts rejected by validation for the current step
+    cell_profiles: Optional[Dict[str, Any]]  # Kernel server /profile summary of executed cells
+
+
+def result_view(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Trimmed view of a finished run for API clients."""
+    plan_match = state.get("plan_match")
+    return {
+        "objective": state.get("objective"),
+        "steps_taken": state.get("steps_taken", 0),
+        "steps": [entry["step"] for entry in state.get("previous_steps", [])],
+        "implemented_cells": state.get("implemented_cells", []),
+        "feedback": state.get("feedback"),
+        "notebook_path": state.get("notebook_path"),
+        "validation_issues": state.get("validation_issues", []),
+        "fatal_error": state.get("fatal_error", False),
+        "plan_reused": bool(plan_match and plan_match["reuse"]),
+    }
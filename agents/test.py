@@ -2,22 +2,24 @@
 
 from crewai import Agent, Task, Crew, Process
 from langchain_openai import ChatOpenAI
-import json
 import os
 
-with open('agents/config.json', 'r') as f:
-    config = json.load(f)
+from llm_pool import load_config, load_endpoints
+
+config = load_config()
+# crewai drives its own client, so it gets the pool's first endpoint
+endpoint = load_endpoints(config)[0]
 
 # Set OpenAI environment variables
-os.environ["OPENAI_API_KEY"] = config['apiKey']
-os.environ["OPENAI_API_BASE"] = config['baseURL']
+os.environ["OPENAI_API_KEY"] = endpoint['apiKey']
+os.environ["OPENAI_API_BASE"] = endpoint['baseURL']
 os.environ["OPENAI_PUBLISHER"] = config['publisher']
 
 # Initialize LangChain's ChatOpenAI
 llm = ChatOpenAI(
-    api_key=config['apiKey'],
-    model=config['model'],
-    base_url=config['baseURL'],
+    api_key=endpoint['apiKey'],
+    model=endpoint['model'],
+    base_url=endpoint['baseURL'],
 )
 
 def create_analysis_plan(objective):
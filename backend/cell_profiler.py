@@ -0,0 +1,129 @@
+"""Opt-in per-cell profiling.
+
+The CellProfiler half runs inside kernels (installed by kernel_bootstrap): a
+server arms it with a silent execute, IPython's pre/post_run_cell events time
+the next cell, and the result is read back through user_expressions. The
+helper functions below it are used by the servers to drive that exchange and
+to aggregate profiles per notebook.
+
+Wall and CPU time are always measured; peak memory (tracemalloc) and the
+cProfile top-N are opt-in because both tracers slow the cell down, often
+several-fold for allocation- or call-heavy code. When either is on, the
+reported times include that overhead.
+"""
+import ast
+import json
+import time
+
+PROFILER_NAME = "__cell_profiler__"
+PROFILE_EXPRESSION = f"{PROFILER_NAME}.take_json()"
+
+# Kernel machinery that wraps every cell and would otherwise top the cumulative ranking
+_KERNEL_FRAMES = ("/IPython/", "/ipykernel/", "/traitlets/", "<built-in method builtins.exec>")
+
+
+class CellProfiler:
+    """Measures wall time, CPU time, peak traced memory and optionally a cProfile top-N for one cell."""
+
+    def __init__(self):
+        self.armed = None
+        self.active = None
+        self.last = None
+
+    def arm(self, top_n: int = 0, memory: bool = False):
+        self.armed = {"top_n": top_n, "memory": memory}
+
+    def pre_run_cell(self, info=None):
+        if not self.armed:
+            return
+        options, self.armed = self.armed, None
+        self.active = dict(options)
+        if options["memory"]:
+            import tracemalloc
+            self.active["started_tracing"] = not tracemalloc.is_tracing()
+            if self.active["started_tracing"]:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.active["memory_start"] = tracemalloc.get_traced_memory()[0]
+        if options["top_n"]:
+            import cProfile
+            self.active["profiler"] = cProfile.Profile()
+            self.active["profiler"].enable()
+        self.active["wall_start"] = time.perf_counter()
+        self.active["cpu_start"] = time.process_time()
+
+    def post_run_cell(self, result=None):
+        if not self.active:
+            return
+        active, self.active = self.active, None
+        profile = {
+            "wall_s": round(time.perf_counter() - active["wall_start"], 6),
+            "cpu_s": round(time.process_time() - active["cpu_start"], 6),
+            "peak_memory_delta_bytes": None,
+            "top_functions": None,
+        }
+        if "profiler" in active:
+            active["profiler"].disable()
+            profile["top_functions"] = _top_functions(active["profiler"], active["top_n"])
+        if active["memory"]:
+            import tracemalloc
+            profile["peak_memory_delta_bytes"] = max(0, tracemalloc.get_traced_memory()[1] - active["memory_start"])
+            if active["started_tracing"]:
+                tracemalloc.stop()
+        self.last = profile
+
+    def take_json(self) -> str:
+        profile, self.last = self.last, None
+        return json.dumps(profile)
+
+
+def _top_functions(profiler, top_n: int) -> list:
+    import pstats
+    stats = pstats.Stats(profiler).stats
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.items():
+        if any(frame in filename or frame in name for frame in _KERNEL_FRAMES):
+            continue
+        rows.append({
+            "function": f"{filename}:{line}({name})",
+            "ncalls": ncalls,
+            "tottime_s": round(tottime, 6),
+            "cumtime_s": round(cumtime, 6),
+        })
+    rows.sort(key=lambda row: row["cumtime_s"], reverse=True)
+    return rows[:top_n]
+
+
+def install(shell=None) -> CellProfiler:
+    """Register the profiler with the running IPython shell."""
+    shell = shell or get_ipython()  # noqa: F821 - provided by IPython inside the kernel
+    profiler = CellProfiler()
+    shell.events.register("pre_run_cell", profiler.pre_run_cell)
+    shell.events.register("post_run_cell", profiler.post_run_cell)
+    shell.user_ns[PROFILER_NAME] = profiler
+    shell.user_ns_hidden[PROFILER_NAME] = profiler
+    return profiler
+
+
+def arm_code(top_n: int = 0, memory: bool = False) -> str:
+    """Silent execute that arms profiling for the next cell."""
+    return f"{PROFILER_NAME}.arm(top_n={int(top_n)}, memory={bool(memory)})"
+
+
+def parse_profile(reply_content: dict):
+    """Extract the profile from an execute_reply's user_expressions."""
+    expression = reply_content.get("user_expressions", {}).get("profile", {})
+    if expression.get("status") != "ok":
+        return None
+    return json.loads(ast.literal_eval(expression["data"]["text/plain"]))
+
+
+def summarize(profiles: list, top: int = 5) -> dict:
+    """Aggregate a notebook's cell profiles and rank the hottest cells by wall time."""
+    hottest = sorted(profiles, key=lambda p: p["wall_s"], reverse=True)[:top]
+    return {
+        "cells_profiled": len(profiles),
+        "total_wall_s": round(sum(p["wall_s"] for p in profiles), 6),
+        "total_cpu_s": round(sum(p["cpu_s"] for p in profiles), 6),
+        "hottest_cells": hottest,
+    }
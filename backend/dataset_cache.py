@@ -0,0 +1,177 @@
+"""Shared dataset cache for kernel sessions.
+
+Source files (CSV, JSON, Parquet) are converted once into Arrow IPC files keyed
+by a content fingerprint. Kernels then memory-map those files, so concurrent
+sessions loading the same dataset skip parsing it and share the pages of its
+numeric columns (every column with arrow_dtypes=True) instead of each holding
+a copy. CSV types are pinned to what pd.read_csv infers, so notebooks see the
+same frame here as with the plain pandas fallback they carry.
+This module is imported inside kernels by kernel_bootstrap, which exposes
+load_dataset() to generated notebooks.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+
+# Directory whose files servers may cache on a client's behalf; kernels start here too
+WORKSPACE_DIR = os.path.realpath(os.environ.get("WORKSPACE_DIR", os.getcwd()))
+CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "notebook-pilot-datasets"))
+SAMPLE_BYTES = 64 * 1024  # bytes hashed from each end of the source file
+CACHE_VERSION = 2  # bump when the conversion changes, so older cache files are not reused
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("The dataset cache needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def fingerprint(path: str) -> str:
+    """Cheap content fingerprint: size, mtime and the first and last 64 KB."""
+    st = os.stat(path)
+    digest = hashlib.blake2b(f"{CACHE_VERSION}:{st.st_size}:{st.st_mtime_ns}".encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if st.st_size > SAMPLE_BYTES:
+            f.seek(max(SAMPLE_BYTES, st.st_size - SAMPLE_BYTES))
+            digest.update(f.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def workspace_path(path: str) -> str:
+    """Resolve a client-supplied path, refusing anything outside WORKSPACE_DIR."""
+    resolved = os.path.realpath(os.path.join(WORKSPACE_DIR, path))
+    if os.path.commonpath([resolved, WORKSPACE_DIR]) != WORKSPACE_DIR:
+        raise ValueError(f"{path} is outside the workspace directory")
+    return resolved
+
+
+def cache_path(path: str) -> str:
+    return os.path.join(CACHE_DIR, f"{fingerprint(path)}.arrow")
+
+
+def _read_csv(path: str, delimiter: str):
+    """Read a CSV with pyarrow, typed the way pd.read_csv would type it."""
+    pa = _require_pyarrow()
+    from pyarrow import csv
+    parse_options = csv.ParseOptions(delimiter=delimiter)
+    # Empty fields are nulls in pandas, in string columns too
+    convert_options = csv.ConvertOptions(strings_can_be_null=True)
+    table = csv.read_csv(path, parse_options=parse_options, convert_options=convert_options)
+    # pandas does not infer dates (they stay strings) and reads all-empty columns as float NaN
+    overrides = {}
+    for field in table.schema:
+        if pa.types.is_temporal(field.type):
+            overrides[field.name] = pa.string()
+        elif pa.types.is_null(field.type):
+            overrides[field.name] = pa.float64()
+    if overrides:
+        convert_options.column_types = overrides
+        table = csv.read_csv(path, parse_options=parse_options, convert_options=convert_options)
+    return table
+
+
+def _read_source(path: str):
+    pa = _require_pyarrow()
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".tsv"):
+        return _read_csv(path, "\t" if extension == ".tsv" else ",")
+    if extension in (".json", ".jsonl", ".ndjson"):
+        from pyarrow import json as pa_json
+        try:
+            return pa_json.read_json(path)
+        except pa.ArrowInvalid:
+            # Not newline-delimited (e.g. a top-level JSON array); let pandas parse it
+            import pandas as pd
+            return pa.Table.from_pandas(pd.read_json(path), preserve_index=False)
+    if extension == ".parquet":
+        from pyarrow import parquet
+        return parquet.read_table(path)
+    if extension in (".feather", ".arrow"):
+        from pyarrow import feather
+        return feather.read_table(path)
+    raise ValueError(f"Unsupported dataset format: {extension or path}")
+
+
+def ensure_cached(path: str) -> str:
+    """Convert path into the cache if needed and return the cached Arrow file."""
+    pa = _require_pyarrow()
+    target = cache_path(path)
+    if os.path.exists(target):
+        return target
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # One chunk per column, so numeric columns are contiguous in the file and can be mapped directly
+    table = _read_source(path).combine_chunks()
+    # Write under a unique name and rename, so racing sessions never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return target
+
+
+def load_table(path: str):
+    """Return the dataset as a pyarrow Table backed by the memory-mapped cache file."""
+    pa = _require_pyarrow()
+    source = pa.memory_map(ensure_cached(path), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_dataset(path: str, as_pandas: bool = True, arrow_dtypes: bool = False):
+    """Load a dataset through the shared cache.
+
+    By default returns a pandas DataFrame with the usual numpy dtypes. This is
+    not fully zero-copy: string, boolean and temporal columns and any column
+    with nulls are converted into process memory. Integer and float columns
+    without nulls are numpy views of a private copy-on-write mapping of the
+    cache file, so kernels share their pages until one writes to them.
+    arrow_dtypes=True returns an ArrowDtype-backed frame that copies nothing.
+    With as_pandas=False the pyarrow Table itself is returned.
+    """
+    if not as_pandas:
+        return load_table(path)
+    pa = _require_pyarrow()
+    import numpy as np
+    import pandas as pd
+    with open(ensure_cached(path), 'rb') as f:
+        # Writable private mapping: pages stay shared with other kernels until modified
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    buffer = pa.py_buffer(mapped)
+    table = pa.ipc.open_file(pa.BufferReader(buffer)).read_all()
+    if arrow_dtypes:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        chunk = column.chunk(0) if column.num_chunks == 1 else None
+        if chunk is not None and chunk.null_count == 0 and (
+                pa.types.is_integer(chunk.type) or pa.types.is_floating(chunk.type)):
+            dtype = np.dtype(chunk.type.to_pandas_dtype())
+            offset = chunk.buffers()[1].address - buffer.address + chunk.offset * dtype.itemsize
+            columns[name] = np.frombuffer(mapped, dtype=dtype, count=len(chunk), offset=offset)
+    converted = table.drop_columns(list(columns)).to_pandas() if len(columns) < table.num_columns else None
+    for name in table.column_names:
+        if name not in columns:
+            columns[name] = converted[name]
+    return pd.DataFrame({name: columns[name] for name in table.column_names}, copy=False)
+
+
+def cache_info() -> list:
+    """List cached datasets with their size."""
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    entries = []
+    for name in sorted(os.listdir(CACHE_DIR)):
+        if name.endswith(".arrow"):
+            entries.append({
+                "fingerprint": name[:-len(".arrow")],
+                "size": os.path.getsize(os.path.join(CACHE_DIR, name)),
+            })
+    return entries
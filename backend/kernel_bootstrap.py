@@ -0,0 +1,31 @@
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs silently in every new kernel so generated notebooks can call the helpers directly
+BOOTSTRAP_CODE = f"""
+import sys as _sys
+if {BACKEND_DIR!r} not in _sys.path:
+    _sys.path.insert(0, {BACKEND_DIR!r})
+from dataset_cache import load_dataset
+import cell_profiler as _cell_profiler
+_cell_profiler.install()
+import table_preview as _table_preview
+_table_preview.install()
+del _sys, _cell_profiler, _table_preview
+"""
+
+
+def bootstrap_kernel(kc, timeout: float = 30):
+    """Wait for a fresh kernel and inject the helper imports without leaving iopub messages behind."""
+    kc.wait_for_ready(timeout=timeout)
+    kc.execute_interactive(BOOTSTRAP_CODE, silent=True, store_history=False, timeout=timeout,
+                           output_hook=lambda msg: None)
+
+
+def read_execute_reply(kc, msg_id: str, timeout: float = 2):
+    """Read shell replies until the one for msg_id, skipping replies to earlier requests."""
+    while True:
+        reply = kc.get_shell_msg(timeout=timeout)
+        if reply['parent_header'].get('msg_id') == msg_id:
+            return reply
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+MAX_KERNELS = int(os.environ.get("MAX_KERNELS", os.cpu_count() or 1))
+KERNEL_MEMORY_MB = int(os.environ.get("KERNEL_MEMORY_MB", 2048))  # cgroup memory.max per kernel
+# Opt-in RLIMIT_DATA fallback where cgroups are unavailable; 0 disables it. RLIMIT_DATA
+# counts virtual reservations, and pyarrow's allocator reserves over 1 GB up front, so
+# it must be set well above the memory a kernel is expected to use
+KERNEL_RLIMIT_DATA_MB = int(os.environ.get("KERNEL_RLIMIT_DATA_MB", 0))
+KERNEL_CPU_SECONDS = int(os.environ.get("KERNEL_CPU_SECONDS", 0))  # 0 disables the total CPU-time cap
+KERNEL_CPU_QUOTA = float(os.environ.get("KERNEL_CPU_QUOTA", 1.0))  # cores per kernel under cgroups
+ADMISSION_TIMEOUT = float(os.environ.get("ADMISSION_TIMEOUT", 30))
+CGROUP_ROOT = os.environ.get("KERNEL_CGROUP_ROOT", "/sys/fs/cgroup/notebook-pilot")
+
+ADMISSION_POLL_INTERVAL = 0.05  # seconds between slot checks for event-loop waiters
+CGROUP_CPU_PERIOD = 100000  # microseconds
+CGROUP_CONTROLLERS = "+memory +cpu"
+
+
+class AdmissionTimeout(Exception):
+    """Raised when no kernel slot frees up within the admission timeout."""
+
+
+def kernel_pid(km) -> Optional[int]:
+    """PID of a KernelManager's kernel process across jupyter_client versions."""
+    provisioner = getattr(km, "provisioner", None)
+    if provisioner is not None and getattr(provisioner, "pid", None):
+        return provisioner.pid
+    kernel = getattr(km, "kernel", None)
+    return getattr(kernel, "pid", None)
+
+
+def _cgroup_available() -> bool:
+    parent = os.path.dirname(CGROUP_ROOT)
+    return os.path.exists(os.path.join(parent, "cgroup.controllers")) and os.access(parent, os.W_OK)
+
+
+def _enable_cgroup_controllers() -> bool:
+    """Create CGROUP_ROOT and delegate the memory and cpu controllers down to per-kernel groups."""
+    try:
+        os.makedirs(CGROUP_ROOT, exist_ok=True)
+        # Controllers must be enabled in every ancestor's subtree_control to reach the kernel groups
+        for group in (os.path.dirname(CGROUP_ROOT), CGROUP_ROOT):
+            with open(os.path.join(group, "cgroup.subtree_control"), 'w') as f:
+                f.write(CGROUP_CONTROLLERS)
+    except OSError as e:
+        print(f"Could not enable cgroup controllers under {CGROUP_ROOT}: {e}")
+        return False
+    return True
+
+
+def _read_proc_usage(pid: int) -> Dict:
+    """CPU seconds and RSS of a process from /proc (Linux)."""
+    usage = {"cpu_s": None, "rss_bytes": None}
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        usage["cpu_s"] = round((int(fields[11]) + int(fields[12])) / ticks, 3)
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    usage["rss_bytes"] = int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return usage
+
+
+class KernelScheduler:
+    """Admission control, resource limits and CPU pinning for kernel processes.
+
+    At most max_kernels kernels run at once; further starts wait in a FIFO
+    queue up to the admission timeout. Each admitted kernel gets a cgroup v2
+    group with memory.max/cpu.max when the hierarchy is writable, optional
+    rlimits (CPU seconds, and a data-segment fallback), and is pinned to the
+    least-loaded CPU core.
+    """
+
+    def __init__(self, max_kernels: int = MAX_KERNELS, memory_mb: int = KERNEL_MEMORY_MB,
+                 cpu_seconds: int = KERNEL_CPU_SECONDS, cpu_quota: float = KERNEL_CPU_QUOTA,
+                 admission_timeout: float = ADMISSION_TIMEOUT, rlimit_data_mb: int = KERNEL_RLIMIT_DATA_MB):
+        self.max_kernels = max_kernels
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.rlimit_data_bytes = rlimit_data_mb * 1024 * 1024
+        self.cpu_seconds = cpu_seconds
+        self.cpu_quota = cpu_quota
+        self.admission_timeout = admission_timeout
+        self.lock = threading.Lock()
+        self.admitted = 0  # slots handed out, including kernels still starting
+        self.queue = []  # tickets waiting for a slot, in arrival order
+        self.kernels = {}  # kernel_id -> {"pid", "core", "cgroup", "started_at"}
+        try:
+            self.cores = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            self.cores = list(range(os.cpu_count() or 1))
+        self.use_cgroups = _cgroup_available() and _enable_cgroup_controllers()
+
+    async def admit(self, timeout: Optional[float] = None):
+        """Wait in FIFO order for a kernel slot without holding a thread; raises AdmissionTimeout if none frees up in time."""
+        timeout = self.admission_timeout if timeout is None else timeout
+        ticket = object()
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            self.queue.append(ticket)
+        try:
+            while True:
+                with self.lock:
+                    if self.queue[0] is ticket and self.admitted < self.max_kernels:
+                        self.admitted += 1
+                        return
+                    waiting = len(self.queue) - 1
+                if time.monotonic() >= deadline:
+                    raise AdmissionTimeout(
+                        f"All {self.max_kernels} kernel slots are busy ({waiting} other requests waiting)")
+                await asyncio.sleep(ADMISSION_POLL_INTERVAL)
+        finally:
+            with self.lock:
+                self.queue.remove(ticket)
+
+    def release(self, kernel_id: Optional[str] = None):
+        """Free a slot taken by admit(), dropping the kernel's cgroup if it has one."""
+        with self.lock:
+            info = self.kernels.pop(kernel_id, None) if kernel_id else None
+            self.admitted = max(0, self.admitted - 1)
+        if info and info["cgroup"]:
+            try:
+                os.rmdir(info["cgroup"])
+            except OSError:
+                pass
+
+    def _pick_core(self) -> int:
+        load = {core: 0 for core in self.cores}
+        for info in self.kernels.values():
+            if info["core"] in load:
+                load[info["core"]] += 1
+        return min(load, key=lambda core: (load[core], core))
+
+    def register(self, kernel_id: str, km):
+        """Apply limits and pinning to a newly started (or restarted) kernel."""
+        pid = kernel_pid(km)
+        with self.lock:
+            previous = self.kernels.get(kernel_id)
+            core = previous["core"] if previous else self._pick_core()
+            self.kernels[kernel_id] = {"pid": pid, "core": core, "cgroup": previous["cgroup"] if previous else None,
+                                       "started_at": time.time()}
+        if pid is None:
+            return
+        self._apply_rlimits(pid)
+        self._pin(pid, core)
+        if self.use_cgroups:
+            self.kernels[kernel_id]["cgroup"] = self._apply_cgroup(kernel_id, pid)
+
+    def _apply_rlimits(self, pid: int):
+        try:
+            import resource
+        except ImportError:
+            return
+        try:
+            if self.rlimit_data_bytes:
+                resource.prlimit(pid, resource.RLIMIT_DATA, (self.rlimit_data_bytes, self.rlimit_data_bytes))
+            if self.cpu_seconds:
+                resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Could not set rlimits on kernel {pid}: {e}")
+
+    def _pin(self, pid: int, core: int):
+        if not hasattr(os, "sched_setaffinity"):
+            return
+        # Affinity is per thread, so pin every thread the kernel already has
+        try:
+            threads = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+        except OSError:
+            threads = [pid]
+        for tid in threads:
+            try:
+                os.sched_setaffinity(tid, {core})
+            except OSError:
+                pass
+
+    def _apply_cgroup(self, kernel_id: str, pid: int) -> Optional[str]:
+        path = os.path.join(CGROUP_ROOT, kernel_id)
+        try:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "memory.max"), 'w') as f:
+                f.write(str(self.memory_bytes))
+            with open(os.path.join(path, "cpu.max"), 'w') as f:
+                f.write(f"{int(self.cpu_quota * CGROUP_CPU_PERIOD)} {CGROUP_CPU_PERIOD}")
+            with open(os.path.join(path, "cgroup.procs"), 'w') as f:
+                f.write(str(pid))
+        except OSError as e:
+            print(f"Could not place kernel {pid} in cgroup {path}: {e}")
+            return None
+        return path
+
+    def usage(self) -> Dict:
+        """Capacity, queue length and per-kernel resource usage."""
+        with self.lock:
+            kernels = {kernel_id: dict(info) for kernel_id, info in self.kernels.items()}
+            report = {"max_kernels": self.max_kernels, "admitted": self.admitted, "waiting": len(self.queue)}
+        for kernel_id, info in kernels.items():
+            if info["pid"] is not None:
+                info.update(_read_proc_usage(info["pid"]))
+            info["uptime_s"] = round(time.time() - info.pop("started_at"), 1)
+        report["kernels"] = kernels
+        report["limits"] = {"memory_bytes": self.memory_bytes if self.use_cgroups else None,
+                            "rlimit_data_bytes": self.rlimit_data_bytes or None, "cpu_seconds": self.cpu_seconds or None,
+                            "cgroups": self.use_cgroups}
+        return report
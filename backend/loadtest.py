@@ -0,0 +1,223 @@
+"""Load generator for the kernel servers.
+
+Drives either the REST server (/start_kernel + /execute) or the WebSocket
+server (/ws) with concurrent sessions running a mix of cell workloads, and
+prints throughput, latency percentiles, kernel startup times and server RSS
+as JSON.
+
+Usage:
+    python loadtest.py --mode rest --url http://localhost:8000 --sessions 8 --iterations 20
+    python loadtest.py --mode ws --url ws://localhost:8001/ws --workload chatty,plot --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+WORKLOADS = {
+    "cpu": "sum(i * i for i in range(2_000_000))",
+    "chatty": "for i in range(5000):\n    print(i)",
+    "large": "print('x' * 5_000_000)",
+    "plot": (
+        "import matplotlib\n"
+        "matplotlib.use('Agg')\n"
+        "import matplotlib.pyplot as plt, io, base64\n"
+        "fig, ax = plt.subplots()\n"
+        "ax.plot(range(1000))\n"
+        "buf = io.BytesIO()\n"
+        "fig.savefig(buf, format='png')\n"
+        "plt.close(fig)\n"
+        "len(base64.b64encode(buf.getvalue()))"
+    ),
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 4)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": round(ordered[-1], 4)}
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """RSS in bytes of a process and all its descendants (the server plus its kernels)."""
+    try:
+        import psutil
+        root = psutil.Process(pid)
+        return sum(p.memory_info().rss for p in [root] + root.children(recursive=True))
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    # Fall back to /proc on Linux
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            if current == pid:
+                return None
+        stack.extend(children.get(current, []))
+    return total
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {}  # workload -> seconds
+        self.startups = []
+        self.errors = 0
+        self.timeouts = 0  # executions the server stopped waiting on; also counted as errors
+        self.executions = 0
+
+    def record(self, workload: str, latency: float, ok: bool, timed_out: bool = False):
+        self.latencies.setdefault(workload, []).append(latency)
+        self.executions += 1
+        if not ok or timed_out:
+            self.errors += 1
+        if timed_out:
+            self.timeouts += 1
+
+
+async def rest_session(client, workloads: List[str], iterations: int, results: Results, exec_timeout: float):
+    started = time.perf_counter()
+    response = await client.post("/start_kernel")
+    response.raise_for_status()
+    kernel_id = response.json()["kernel_id"]
+    results.startups.append(time.perf_counter() - started)
+    try:
+        for i in range(iterations):
+            workload = workloads[i % len(workloads)]
+            started = time.perf_counter()
+            response = await client.post("/execute", data={"kernel_id": kernel_id, "code": WORKLOADS[workload],
+                                                            "timeout": exec_timeout})
+            status = response.json().get("status") if response.status_code == 200 else None
+            results.record(workload, time.perf_counter() - started, status == "ok", timed_out=status == "timeout")
+    finally:
+        await client.post("/shutdown", data={"kernel_id": kernel_id})
+
+
+async def ws_session(url: str, workloads: List[str], iterations: int, results: Results, timeout: float,
+                     exec_timeout: float):
+    import websockets
+    started = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as ws:
+        message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+        assert message["type"] == "kernel_started", message
+        results.startups.append(time.perf_counter() - started)
+        for i in range(iterations):
+            workload = workloads[i % len(workloads)]
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": "execute", "code": WORKLOADS[workload], "timeout": exec_timeout}))
+            ok, timed_out = True, False
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                if message["type"] == "error":
+                    ok = False
+                    timed_out = timed_out or message.get("timeout", False)
+                elif message["type"] == "execute_done":
+                    break
+            results.record(workload, time.perf_counter() - started, ok, timed_out=timed_out)
+
+
+async def sample_rss(pid: int, samples: List[int], interval: float = 0.5):
+    while True:
+        rss = process_tree_rss(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def run(args) -> Dict:
+    workloads = args.workload.split(",")
+    unknown = [w for w in workloads if w not in WORKLOADS]
+    if unknown:
+        raise SystemExit(f"Unknown workload(s): {', '.join(unknown)}; choose from {', '.join(WORKLOADS)}")
+
+    results = Results()
+    rss_samples = []
+    sampler = asyncio.create_task(sample_rss(args.server_pid, rss_samples)) if args.server_pid else None
+    started = time.perf_counter()
+    if args.mode == "rest":
+        import httpx
+        limits = httpx.Limits(max_connections=args.sessions)
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            sessions = [rest_session(client, workloads, args.iterations, results, args.exec_timeout)
+                        for _ in range(args.sessions)]
+            outcomes = await asyncio.gather(*sessions, return_exceptions=True)
+    else:
+        sessions = [ws_session(args.url, workloads, args.iterations, results, args.timeout, args.exec_timeout)
+                    for _ in range(args.sessions)]
+        outcomes = await asyncio.gather(*sessions, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    if sampler:
+        sampler.cancel()
+
+    failed_sessions = [repr(o) for o in outcomes if isinstance(o, BaseException)]
+    all_latencies = [latency for samples in results.latencies.values() for latency in samples]
+    return {
+        "mode": args.mode,
+        "url": args.url,
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "workloads": workloads,
+        "elapsed_s": round(elapsed, 3),
+        "executions": results.executions,
+        "errors": results.errors,
+        "timeouts": results.timeouts,
+        "failed_sessions": failed_sessions,
+        "throughput_per_s": round(results.executions / elapsed, 3) if elapsed else None,
+        "latency_s": percentiles(all_latencies),
+        "latency_by_workload_s": {w: percentiles(s) for w, s in results.latencies.items()},
+        "kernel_startup_s": percentiles(results.startups),
+        "server_rss_bytes": {"peak": max(rss_samples), "last": rss_samples[-1]} if rss_samples else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the notebook kernel servers.")
+    parser.add_argument("--mode", choices=["rest", "ws"], default="rest")
+    parser.add_argument("--url", default=None, help="Server base URL (REST) or /ws URL (WebSocket)")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent kernel sessions")
+    parser.add_argument("--iterations", type=int, default=10, help="Executions per session")
+    parser.add_argument("--workload", default="cpu,chatty", help=f"Comma-separated mix of {', '.join(WORKLOADS)}")
+    parser.add_argument("--server-pid", type=int, default=None, help="Server PID to sample RSS (includes kernels)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--exec-timeout", type=float, default=60.0,
+                        help="Seconds without kernel output before the server gives up on an execution")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.url is None:
+        args.url = "http://localhost:8000" if args.mode == "rest" else "ws://localhost:8000/ws"
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["errors"] or report["failed_sessions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,29 +2,57 @@ from fastapi import FastAPI, Form, Request
 from fastapi.responses import JSONResponse
 from jupyter_client import KernelManager
 import uuid
+import asyncio
 import threading
+from queue import Empty
+from dataset_cache import ensure_cached, fingerprint, cache_info, workspace_path
+from kernel_bootstrap import bootstrap_kernel, read_execute_reply
+from cell_profiler import PROFILE_EXPRESSION, arm_code, parse_profile, summarize
+from kernel_scheduler import KernelScheduler, AdmissionTimeout
+from table_preview import MIME_TYPE, MAX_PREVIEW_COLUMNS, page_expression, parse_page
 
 app = FastAPI()
 kernels = {}
 kernel_locks = {}
+kernel_profiles = {}
+scheduler = KernelScheduler()
+
+IOPUB_TIMEOUT = 2  # default seconds of iopub silence before /execute gives up
 
 def start_new_kernel():
-    km = KernelManager()
-    km.start_kernel()
-    kc = km.client()
-    kc.start_channels()
+    """Start and bootstrap a kernel in a slot already taken with `await scheduler.admit()`."""
     kernel_id = str(uuid.uuid4())
+    km = KernelManager()
+    try:
+        km.start_kernel()
+        scheduler.register(kernel_id, km)
+        kc = km.client()
+        kc.start_channels()
+        bootstrap_kernel(kc)
+    except Exception:
+        if km.has_kernel:
+            km.shutdown_kernel(now=True)
+        scheduler.release(kernel_id)
+        raise
     kernels[kernel_id] = (km, kc)
     kernel_locks[kernel_id] = threading.Lock()
+    kernel_profiles[kernel_id] = []
     return kernel_id
 
 @app.post("/start_kernel")
-def start_kernel():
-    kernel_id = start_new_kernel()
+async def start_kernel():
+    # Queued starts wait on the event loop, not in worker threads, so they cannot starve /shutdown
+    try:
+        await scheduler.admit()
+    except AdmissionTimeout as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    kernel_id = await asyncio.to_thread(start_new_kernel)
     return {"kernel_id": kernel_id}
 
 @app.post("/execute")
-def execute_code(kernel_id: str = Form(...), code: str = Form(...)):
+def execute_code(kernel_id: str = Form(...), code: str = Form(...),
+                 profile: bool = Form(False), profile_top: int = Form(0), profile_memory: bool = Form(False),
+                 timeout: float = Form(IOPUB_TIMEOUT)):
     if kernel_id not in kernels:
         return JSONResponse(status_code=404, content={"error": "Kernel not found"})
 
@@ -32,11 +60,17 @@ def execute_code(kernel_id: str = Form(...), code: str = Form(...)):
     lock = kernel_locks[kernel_id]
 
     with lock:
-        kc.execute(code)
+        if profile:
+            kc.execute(arm_code(top_n=profile_top, memory=profile_memory), silent=True, store_history=False)
+        msg_id = kc.execute(code, user_expressions={"profile": PROFILE_EXPRESSION} if profile else None)
         outputs = []
+        tables = []
+        status = "ok"  # "error" if the cell raised, "timeout" if output stopped before it finished
         while True:
             try:
-                msg = kc.get_iopub_msg(timeout=2)
+                msg = kc.get_iopub_msg(timeout=timeout)
+                if msg['parent_header'].get('msg_id') != msg_id:
+                    continue
                 msg_type = msg['msg_type']
                 content = msg['content']
 
@@ -44,13 +78,56 @@ def execute_code(kernel_id: str = Form(...), code: str = Form(...)):
                     outputs.append(content['text'])
                 elif msg_type == 'execute_result':
                     outputs.append(content['data'].get('text/plain', ''))
+                    if MIME_TYPE in content['data']:
+                        tables.append(content['data'][MIME_TYPE])
                 elif msg_type == 'error':
                     outputs.append('\n'.join(content['traceback']))
+                    status = "error"
                 elif msg_type == 'status' and content['execution_state'] == 'idle':
                     break
+            except Empty:
+                status = "timeout"
+                break
             except Exception:
+                status = "error"
                 break
-    return {"outputs": outputs}
+        if not profile:
+            return {"status": status, "outputs": outputs, "tables": tables}
+        try:
+            cell_profile = parse_profile(read_execute_reply(kc, msg_id)['content'])
+        except Exception:
+            cell_profile = None
+        if cell_profile is not None:
+            cell_profile["cell"] = len(kernel_profiles[kernel_id])
+            cell_profile["code_preview"] = code.strip()[:200]
+            kernel_profiles[kernel_id].append(cell_profile)
+    return {"status": status, "outputs": outputs, "tables": tables, "profile": cell_profile}
+
+@app.post("/table_page")
+def table_page(kernel_id: str = Form(...), table_id: str = Form(...), offset: int = Form(0),
+               limit: int = Form(100), sort_by: str = Form(None), ascending: bool = Form(True),
+               col_offset: int = Form(0), col_limit: int = Form(MAX_PREVIEW_COLUMNS), stats: bool = Form(False)):
+    if kernel_id not in kernels:
+        return JSONResponse(status_code=404, content={"error": "Kernel not found"})
+
+    km, kc = kernels[kernel_id]
+    with kernel_locks[kernel_id]:
+        expression = page_expression(table_id, offset, limit, sort_by=sort_by, ascending=ascending,
+                                     col_offset=col_offset, col_limit=col_limit, stats=stats)
+        msg_id = kc.execute("", silent=True, store_history=False, user_expressions={"page": expression})
+        try:
+            page = parse_page(read_execute_reply(kc, msg_id)['content'])
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": str(e)})
+    if "error" in page:
+        return JSONResponse(status_code=404, content=page)
+    return page
+
+@app.get("/profile")
+def profile_summary(kernel_id: str, top: int = 5):
+    if kernel_id not in kernels:
+        return JSONResponse(status_code=404, content={"error": "Kernel not found"})
+    return summarize(kernel_profiles[kernel_id], top=top)
 
 @app.post("/interrupt")
 def interrupt_kernel(kernel_id: str = Form(...)):
@@ -66,7 +143,38 @@ def restart_kernel(kernel_id: str = Form(...)):
         return JSONResponse(status_code=404, content={"error": "Kernel not found"})
     km, kc = kernels[kernel_id]
     km.restart_kernel(now=True)
+    scheduler.register(kernel_id, km)
     kc = km.client()
     kc.start_channels()
+    bootstrap_kernel(kc)
     kernels[kernel_id] = (km, kc)
     return {"status": "restarted"}
+
+@app.post("/shutdown")
+def shutdown_kernel(kernel_id: str = Form(...)):
+    if kernel_id not in kernels:
+        return JSONResponse(status_code=404, content={"error": "Kernel not found"})
+    km, kc = kernels.pop(kernel_id)
+    kernel_locks.pop(kernel_id, None)
+    kernel_profiles.pop(kernel_id, None)
+    kc.stop_channels()
+    km.shutdown_kernel(now=True)
+    scheduler.release(kernel_id)
+    return {"status": "shut down"}
+
+@app.get("/kernels/usage")
+def kernel_usage():
+    return scheduler.usage()
+
+@app.post("/datasets/cache")
+def cache_dataset(path: str = Form(...)):
+    try:
+        path = workspace_path(path)
+        cached = ensure_cached(path)
+    except (OSError, ValueError, ImportError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"fingerprint": fingerprint(path), "cache_path": cached}
+
+@app.get("/datasets")
+def list_datasets():
+    return {"datasets": cache_info()}
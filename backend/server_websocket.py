@@ -1,65 +1,205 @@
 import uuid
+import time
 import asyncio
+from queue import Empty
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from jupyter_client import KernelManager
+from stream_output import StreamCoalescer, SocketSender
+from kernel_bootstrap import bootstrap_kernel, read_execute_reply
+from cell_profiler import PROFILE_EXPRESSION, arm_code, parse_profile, summarize
+from kernel_scheduler import KernelScheduler, AdmissionTimeout
+from table_preview import MIME_TYPE, MAX_PREVIEW_COLUMNS, page_expression, parse_page
 
 app = FastAPI()
 
 kernels = {}
+kernel_profiles = {}
+scheduler = KernelScheduler()
 
-def start_kernel():
+IOPUB_TIMEOUT = 2  # seconds of iopub silence before giving up on an execution
+IOPUB_BATCH = 500  # max messages pulled per thread hop
+
+def start_kernel(kernel_id: str):
     km = KernelManager()
-    km.start_kernel()
-    kc = km.client()
-    kc.start_channels()
+    try:
+        km.start_kernel()
+        scheduler.register(kernel_id, km)
+        kc = km.client()
+        kc.start_channels()
+        bootstrap_kernel(kc)
+    except Exception:
+        if km.has_kernel:
+            km.shutdown_kernel(now=True)
+        raise
     return km, kc
 
+@app.get("/kernels/usage")
+def kernel_usage():
+    return scheduler.usage()
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     kernel_id = str(uuid.uuid4())
-    km, kc = start_kernel()
+    try:
+        await scheduler.admit()
+    except AdmissionTimeout as e:
+        await websocket.send_json({"type": "error", "output": str(e)})
+        await websocket.close(code=1013)  # try again later
+        return
+    try:
+        km, kc = await asyncio.to_thread(start_kernel, kernel_id)
+    except Exception:
+        scheduler.release(kernel_id)
+        raise
     kernels[kernel_id] = (km, kc)
-    await websocket.send_json({"type": "kernel_started", "kernel_id": kernel_id})
+    kernel_profiles[kernel_id] = []
+    sender = SocketSender(websocket)
+    await sender.send({"type": "kernel_started", "kernel_id": kernel_id})
 
     try:
         while True:
             data = await websocket.receive_json()
             if data.get("type") == "execute":
                 code = data["code"]
-                await handle_execution(websocket, kernel_id, code)
+                await handle_execution(sender, kernel_id, code,
+                                       profile=data.get("profile", False), profile_top=data.get("profile_top", 0),
+                                       profile_memory=data.get("profile_memory", False),
+                                       timeout=data.get("timeout", IOPUB_TIMEOUT))
+            elif data.get("type") == "table_page":
+                await handle_table_page(sender, kernel_id, data)
+            elif data.get("type") == "profile_summary":
+                await sender.send({"type": "profile_summary",
+                                   **summarize(kernel_profiles[kernel_id], top=data.get("top", 5))})
     except WebSocketDisconnect:
-        km.shutdown_kernel()
+        print(f"WebSocket disconnected, shutting down kernel {kernel_id}.")
+    finally:
+        # Any exit from the loop, not just a disconnect, must free the kernel and its slot
+        await sender.close()
         kernels.pop(kernel_id, None)
-        print(f"WebSocket disconnected, kernel {kernel_id} shut down.")
+        kernel_profiles.pop(kernel_id, None)
+        try:
+            km.shutdown_kernel()
+        finally:
+            scheduler.release(kernel_id)
+
+def read_iopub_batch(kc, timeout: float) -> list:
+    """Block for one iopub message, then take whatever else is already queued."""
+    messages = [kc.get_iopub_msg(timeout=timeout)]
+    while len(messages) < IOPUB_BATCH:
+        try:
+            messages.append(kc.get_iopub_msg(timeout=0))
+        except Empty:
+            break
+    return messages
+
+async def flush_streams(sender: SocketSender, coalescer: StreamCoalescer):
+    for message in coalescer.drain():
+        await sender.send(message)
+
+async def pump_streams(sender: SocketSender, coalescer: StreamCoalescer):
+    # While the client lags, keep coalescing (shedding the oldest output past the cap)
+    # instead of queueing more frames
+    if sender.congested():
+        coalescer.shed()
+    elif coalescer.due():
+        await flush_streams(sender, coalescer)
 
-async def handle_execution(websocket: WebSocket, kernel_id: str, code: str):
+def fetch_table_page(kc, data: dict) -> dict:
+    expression = page_expression(data["table_id"], data.get("offset", 0), data.get("limit", 100),
+                                 sort_by=data.get("sort_by"), ascending=data.get("ascending", True),
+                                 col_offset=data.get("col_offset", 0), col_limit=data.get("col_limit", MAX_PREVIEW_COLUMNS),
+                                 stats=data.get("stats", False))
+    msg_id = kc.execute("", silent=True, store_history=False, user_expressions={"page": expression})
+    return parse_page(read_execute_reply(kc, msg_id, IOPUB_TIMEOUT)["content"])
+
+async def handle_table_page(sender: SocketSender, kernel_id: str, data: dict):
+    km, kc = kernels[kernel_id]
+    try:
+        page = await asyncio.to_thread(fetch_table_page, kc, data)
+    except Exception as e:
+        page = {"error": str(e)}
+    await sender.send({"type": "table_page", **page})
+
+async def send_profile(sender: SocketSender, kernel_id: str, kc, msg_id: str, code: str):
+    try:
+        reply = await asyncio.to_thread(read_execute_reply, kc, msg_id, IOPUB_TIMEOUT)
+        cell_profile = parse_profile(reply["content"])
+    except Exception:
+        cell_profile = None
+    if cell_profile is not None:
+        cell_profile["cell"] = len(kernel_profiles[kernel_id])
+        cell_profile["code_preview"] = code.strip()[:200]
+        kernel_profiles[kernel_id].append(cell_profile)
+    await sender.send({"type": "profile", "profile": cell_profile})
+
+async def handle_execution(sender: SocketSender, kernel_id: str, code: str,
+                           profile: bool = False, profile_top: int = 0, profile_memory: bool = False,
+                           timeout: float = IOPUB_TIMEOUT):
     km, kc = kernels[kernel_id]
-    kc.execute(code)
+    if profile:
+        kc.execute(arm_code(top_n=profile_top, memory=profile_memory), silent=True, store_history=False)
+    msg_id = kc.execute(code, user_expressions={"profile": PROFILE_EXPRESSION} if profile else None)
+    coalescer = StreamCoalescer()
+    last_message_at = time.monotonic()
 
     while True:
         try:
-            msg = kc.get_iopub_msg(timeout=2)
-            msg_type = msg["msg_type"]
-            content = msg["content"]
+            try:
+                batch = await asyncio.to_thread(read_iopub_batch, kc, coalescer.flush_interval)
+                last_message_at = time.monotonic()
+            except Empty:
+                if time.monotonic() - last_message_at < timeout:
+                    batch = []
+                else:
+                    raise
+
+            done = False
+            for msg in batch:
+                if msg["parent_header"].get("msg_id") != msg_id:
+                    continue
+                msg_type = msg["msg_type"]
+                content = msg["content"]
+
+                if msg_type == "stream":
+                    coalescer.append(content["name"], content["text"])
+                    await pump_streams(sender, coalescer)
 
-            if msg_type == "stream":
-                await websocket.send_json({"type": "stream", "output": content["text"]})
+                elif msg_type == "execute_result":
+                    await flush_streams(sender, coalescer)
+                    result = {"type": "result", "output": content["data"].get("text/plain", "")}
+                    if MIME_TYPE in content["data"]:
+                        result["table"] = content["data"][MIME_TYPE]
+                    await sender.send(result)
 
-            elif msg_type == "execute_result":
-                await websocket.send_json({"type": "result", "output": content["data"].get("text/plain", "")})
+                elif msg_type == "error":
+                    await flush_streams(sender, coalescer)
+                    await sender.send({
+                        "type": "error",
+                        "ename": content["ename"],
+                        "evalue": content["evalue"],
+                        "traceback": content["traceback"]
+                    })
 
-            elif msg_type == "error":
-                await websocket.send_json({
-                    "type": "error",
-                    "ename": content["ename"],
-                    "evalue": content["evalue"],
-                    "traceback": content["traceback"]
-                })
+                elif msg_type == "status" and content["execution_state"] == "idle":
+                    done = True
+                    break
 
-            elif msg_type == "status" and content["execution_state"] == "idle":
+            if done:
+                await flush_streams(sender, coalescer)
                 break
+            await pump_streams(sender, coalescer)
 
+        except Empty:
+            await flush_streams(sender, coalescer)
+            await sender.send({"type": "error", "output": f"No output for {timeout}s; stopped waiting", "timeout": True})
+            break
         except Exception as e:
-            await websocket.send_json({"type": "error", "output": str(e)})
+            await flush_streams(sender, coalescer)
+            await sender.send({"type": "error", "output": str(e)})
             break
+
+    if profile:
+        await send_profile(sender, kernel_id, kc, msg_id, code)
+    # Lets clients tell when an execution is finished, even if it produced no result
+    await sender.send({"type": "execute_done"})
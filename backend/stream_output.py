@@ -0,0 +1,138 @@
+import asyncio
+import time
+from fastapi import WebSocket
+
+FLUSH_INTERVAL = 0.05  # seconds between stream flushes
+MAX_CHUNK_CHARS = 64 * 1024  # flush early once this much output is buffered
+MAX_PENDING_CHARS = 4 * 1024 * 1024  # oldest output is dropped beyond this while the client lags
+SEND_QUEUE_SIZE = 64  # frames queued per socket before it counts as congested
+
+
+def collapse_carriage_returns(text: str, continues_line: bool = True) -> str:
+    """Collapse '\\r'-overwritten segments so progress bars only keep their latest state.
+
+    When continues_line is True the first line may continue text the client already
+    has, so a leading '\\r' is kept to tell the client to overwrite it.
+    """
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        if "\r" not in line:
+            continue
+        segments = line.split("\r")
+        last = max((j for j, segment in enumerate(segments) if segment), default=0)
+        collapsed = segments[last]
+        if last > 0 and i == 0 and continues_line:
+            collapsed = "\r" + collapsed
+        if last < len(segments) - 1:
+            # The line ended with '\r', so the next write still overwrites it
+            collapsed += "\r"
+        lines[i] = collapsed
+    return "\n".join(lines)
+
+
+class StreamCoalescer:
+    """Buffers iopub stream text and releases it in time- and size-bounded chunks."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_chunk_chars: int = MAX_CHUNK_CHARS,
+                 max_pending_chars: int = MAX_PENDING_CHARS):
+        self.flush_interval = flush_interval
+        self.max_chunk_chars = max_chunk_chars
+        self.max_pending_chars = max_pending_chars
+        self.chunks = []  # [stream name, text] in arrival order, same-name runs merged
+        self.pending_chars = 0
+        self.dropped_chars = 0
+        self.first_pending_at = None
+
+    def append(self, name: str, text: str):
+        if not text:
+            return
+        if self.first_pending_at is None:
+            self.first_pending_at = time.monotonic()
+        if self.chunks and self.chunks[-1][0] == name:
+            self.chunks[-1][1] += text
+        else:
+            self.chunks.append([name, text])
+        self.pending_chars += len(text)
+
+    def shed(self):
+        """Drop the oldest output beyond max_pending_chars; only called while the client lags."""
+        if self.pending_chars > self.max_pending_chars:
+            self._drop_oldest(self.pending_chars - self.max_pending_chars)
+
+    def _drop_oldest(self, excess: int):
+        while excess > 0 and self.chunks:
+            name, text = self.chunks[0]
+            if len(text) <= excess:
+                self.chunks.pop(0)
+                dropped = len(text)
+            else:
+                self.chunks[0][1] = text[excess:]
+                dropped = excess
+            excess -= dropped
+            self.pending_chars -= dropped
+            self.dropped_chars += dropped
+
+    def due(self) -> bool:
+        """Whether buffered output should be flushed now."""
+        if not self.chunks:
+            return False
+        if self.pending_chars >= self.max_chunk_chars:
+            return True
+        return time.monotonic() - self.first_pending_at >= self.flush_interval
+
+    def drain(self) -> list:
+        """Return buffered output as websocket messages of at most max_chunk_chars and reset the buffer."""
+        messages = []
+        if self.dropped_chars:
+            messages.append({"type": "stream_dropped", "dropped_chars": self.dropped_chars})
+        for name, text in self.chunks:
+            text = collapse_carriage_returns(text)
+            for start in range(0, len(text), self.max_chunk_chars):
+                messages.append({"type": "stream", "name": name, "output": text[start:start + self.max_chunk_chars]})
+        self.chunks = []
+        self.pending_chars = 0
+        self.dropped_chars = 0
+        self.first_pending_at = None
+        return messages
+
+
+class SocketSender:
+    """Per-socket send queue so a slow client applies backpressure instead of blocking the kernel reader."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int = SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                break
+            try:
+                await self.websocket.send_json(message)
+            except Exception:
+                # Client went away; the receive loop handles the disconnect
+                self.closed = True
+                break
+
+    def congested(self) -> bool:
+        return self.queue.full()
+
+    async def send(self, message: dict):
+        if self.closed:
+            return
+        await self.queue.put(message)
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
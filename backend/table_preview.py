@@ -0,0 +1,209 @@
+"""Compact, typed previews of DataFrame results.
+
+Inside kernels (installed by kernel_bootstrap) a display formatter turns every
+DataFrame result into a small preview under MIME_TYPE: schema, head and tail
+rows of the first MAX_PREVIEW_COLUMNS columns, with rows in a binary columnar
+encoding (Arrow IPC, base64) when pyarrow is available. The frame is kept in a
+bounded registry so servers can page through further row and column windows,
+and per-column summary stats, on demand instead of rendering the whole frame
+to a string.
+"""
+import ast
+import base64
+import json
+from collections import OrderedDict
+
+MIME_TYPE = "application/vnd.notebook-pilot.table+json"
+PREVIEWER_NAME = "__table_preview__"
+HEAD_ROWS = 10
+TAIL_ROWS = 5
+MAX_TEXT_COLUMNS = 20
+MAX_PREVIEW_COLUMNS = 20  # wider frames are previewed on their first columns; the rest are paged
+MAX_PAGE_ROWS = 1000
+MAX_PAGE_COLUMNS = 200
+MAX_TABLES = 32  # frames kept for paging per kernel; oldest are forgotten
+
+
+def encode_rows(frame) -> dict:
+    """Encode a row window as Arrow IPC (base64), falling back to JSON columns."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return {"encoding": "arrow-ipc-base64", "data": base64.b64encode(sink.getvalue().to_pybytes()).decode()}
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError):
+            pass  # mixed-type object columns or duplicate column names; send them as JSON instead
+    # Same shape as orient="split" without the index, which would drop duplicate column names
+    rows = json.loads(frame.to_json(orient="values", date_format="iso"))
+    return {"encoding": "json-columns", "data": {"columns": [str(c) for c in frame.columns], "data": rows}}
+
+
+def _column_stats(series) -> dict:
+    stats = {"name": str(series.name), "nulls": int(series.isna().sum())}
+    if series.dtype.kind in "iufb":
+        described = series.describe()
+        for key in ("mean", "std", "min", "max"):
+            if key in described and described[key] == described[key]:  # skip NaN
+                stats[key] = float(described[key])
+    return stats
+
+
+def _schema(window) -> list:
+    return [{"name": name, "dtype": str(dtype)} for name, dtype in window.dtypes.items()]
+
+
+class TablePreviewer:
+    """Builds previews for DataFrames and serves row/column pages for the ones it has seen.
+
+    Frames are kept as displayed; only the requested window is sliced out and
+    flattened, so neither previews nor pages copy the whole frame.
+    """
+
+    def __init__(self):
+        self.tables = OrderedDict()  # table_id -> DataFrame
+        self.sorted_cache = {}  # table_id -> ((column, ascending), sorted DataFrame), one ordering per table
+        self.next_id = 0
+
+    def _register(self, frame) -> str:
+        table_id = f"t{self.next_id}"
+        self.next_id += 1
+        self.tables[table_id] = frame
+        while len(self.tables) > MAX_TABLES:
+            evicted, _ = self.tables.popitem(last=False)
+            self.sorted_cache.pop(evicted, None)
+        return table_id
+
+    @staticmethod
+    def _window(frame, rows: slice, col_offset: int = 0, col_limit: int = MAX_PREVIEW_COLUMNS, drop_index=None):
+        """Row and column window with column names as strings and a non-default index turned into columns.
+
+        drop_index defaults to whether frame has a RangeIndex; pass the original
+        frame's answer for sorted copies, whose index is permuted.
+        """
+        import pandas as pd
+        if drop_index is None:
+            drop_index = isinstance(frame.index, pd.RangeIndex)
+        window = frame.iloc[rows, col_offset:col_offset + col_limit]
+        window = window.reset_index(drop=drop_index)
+        if not all(isinstance(c, str) for c in window.columns):
+            window = window.set_axis([str(c) for c in window.columns], axis=1)
+        return window
+
+    def preview(self, frame) -> dict:
+        table_id = self._register(frame)
+        n_rows, n_cols = frame.shape
+        truncated = n_rows > HEAD_ROWS + TAIL_ROWS
+        head = self._window(frame, slice(0, HEAD_ROWS) if truncated else slice(None))
+        return {
+            "table_id": table_id,
+            "n_rows": n_rows,
+            "n_cols": n_cols,  # data columns in the frame; the preview holds at most MAX_PREVIEW_COLUMNS of them
+            "preview_cols": min(n_cols, MAX_PREVIEW_COLUMNS),
+            "schema": _schema(head),
+            "head": encode_rows(head),
+            "tail": encode_rows(self._window(frame, slice(n_rows - TAIL_ROWS, None))) if truncated else None,
+        }
+
+    def safe_preview(self, frame):
+        """Formatter entry point: a preview failure drops the MIME type instead of failing the cell."""
+        try:
+            return self.preview(frame)
+        except Exception:
+            return None
+
+    def _sorted(self, table_id: str, frame, sort_by: str, ascending: bool):
+        ordering = (sort_by, ascending)
+        cached = self.sorted_cache.get(table_id)
+        if cached is None or cached[0] != ordering:
+            # Match the flattened name back to a column label, or sort by a named index level
+            labels = [c for c in frame.columns if str(c) == sort_by]
+            by = labels[0] if labels else sort_by
+            cached = (ordering, frame.sort_values(by, ascending=ascending, kind="stable"))
+            self.sorted_cache[table_id] = cached
+        return cached[1]
+
+    def page(self, table_id: str, offset: int = 0, limit: int = 100, sort_by=None, ascending: bool = True,
+             col_offset: int = 0, col_limit: int = MAX_PREVIEW_COLUMNS, stats: bool = False) -> dict:
+        if table_id not in self.tables:
+            raise KeyError(f"Unknown table {table_id!r}; it may have been evicted")
+        self.tables.move_to_end(table_id)
+        frame = self.tables[table_id]
+        import pandas as pd
+        drop_index = isinstance(frame.index, pd.RangeIndex)
+        if sort_by is not None:
+            frame = self._sorted(table_id, frame, sort_by, ascending)
+        limit = max(0, min(int(limit), MAX_PAGE_ROWS))
+        offset = max(0, int(offset))
+        col_limit = max(0, min(int(col_limit), MAX_PAGE_COLUMNS))
+        col_offset = max(0, int(col_offset))
+        window = self._window(frame, slice(offset, offset + limit), col_offset, col_limit, drop_index=drop_index)
+        page = {
+            "table_id": table_id,
+            "offset": offset,
+            "n_rows": len(frame),
+            "col_offset": col_offset,
+            "n_cols": frame.shape[1],
+            "schema": _schema(window),
+            "rows": encode_rows(window),
+        }
+        if stats:
+            # Over the whole column, for the page's columns only; computed on request, never per display
+            columns = range(col_offset, min(col_offset + col_limit, frame.shape[1]))
+            page["stats"] = [_column_stats(frame.iloc[:, i]) for i in columns]
+        return page
+
+    def page_json(self, *args, **kwargs) -> str:
+        return json.dumps(self.page(*args, **kwargs))
+
+
+def _text_repr(frame, p, cycle):
+    # Bounded text fallback for text-only clients; never renders the full frame
+    p.text(frame.to_string(max_rows=HEAD_ROWS + TAIL_ROWS, max_cols=MAX_TEXT_COLUMNS, show_dimensions=True))
+
+
+def install(shell=None) -> TablePreviewer:
+    """Register the table preview formatter with the running IPython shell."""
+    from IPython.core.formatters import BaseFormatter
+    from traitlets import ObjectName, Unicode
+
+    class TablePreviewFormatter(BaseFormatter):
+        format_type = Unicode(MIME_TYPE)
+        print_method = ObjectName("_repr_table_preview_")
+        _return_type = dict
+
+    shell = shell or get_ipython()  # noqa: F821 - provided by IPython inside the kernel
+    previewer = TablePreviewer()
+    formatters = shell.display_formatter.formatters
+    formatters[MIME_TYPE] = TablePreviewFormatter(parent=shell.display_formatter)
+    # Deferred by name so pandas is not imported until a notebook uses it; the
+    # class reports its module as "pandas" on pandas 3 and "pandas.core.frame" before
+    for module in ("pandas", "pandas.core.frame"):
+        formatters[MIME_TYPE].for_type_by_name(module, "DataFrame", previewer.safe_preview)
+        formatters["text/plain"].for_type_by_name(module, "DataFrame", _text_repr)
+        # The preview replaces the HTML table, which would otherwise be rendered and discarded
+        formatters["text/html"].for_type_by_name(module, "DataFrame", lambda frame: None)
+    shell.user_ns[PREVIEWER_NAME] = previewer
+    shell.user_ns_hidden[PREVIEWER_NAME] = previewer
+    return previewer
+
+
+def page_expression(table_id: str, offset: int, limit: int, sort_by=None, ascending: bool = True,
+                    col_offset: int = 0, col_limit: int = MAX_PREVIEW_COLUMNS, stats: bool = False) -> str:
+    """user_expressions entry that fetches a page from the kernel's previewer."""
+    return (f"{PREVIEWER_NAME}.page_json({str(table_id)!r}, {int(offset)}, {int(limit)}, "
+            f"sort_by={sort_by if sort_by is None else str(sort_by)!r}, ascending={bool(ascending)}, "
+            f"col_offset={int(col_offset)}, col_limit={int(col_limit)}, stats={bool(stats)})")
+
+
+def parse_page(reply_content: dict) -> dict:
+    """Extract a page (or the kernel-side error) from an execute_reply."""
+    expression = reply_content.get("user_expressions", {}).get("page", {})
+    if expression.get("status") != "ok":
+        return {"error": f"{expression.get('ename', 'Error')}: {expression.get('evalue', 'page request failed')}"}
+    return json.loads(ast.literal_eval(expression["data"]["text/plain"]))